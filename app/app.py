@@ -1,9 +1,66 @@
-from flask import Flask, render_template, redirect
-from pymongo import MongoClient
+from flask import Flask, render_template, redirect, request, abort, make_response, jsonify
+from pymongo import MongoClient, DESCENDING
+from collections import OrderedDict
 import jinja2
+import time
+import gzip
+import hashlib
+import cStringIO
 
 app = Flask(__name__)
 
+DASHBOARD_PAGE_SIZE = 50 # businesses per page of the dashboard
+INDEX_CHECK_INTERVAL = 5.0 # seconds between checks for changed summaries
+
+SENTENCES_SHOWN = 10 # sentences per polarity shown for each aspect
+PAGE_CACHE_SIZE = 256 # rendered summary pages kept in memory
+MAX_API_LIMIT = 100 # most sentences per polarity returned by one API request
+
+POLARITIES = ('pos', 'neg')
+SENTENCE_FIELDS = ('text', 'user', 'prob_opin', 'prob_pos', 'prob_neg') # sentence data served by the API
+
+# In-process cache of the business listing (see get_business_index)
+BUSINESS_INDEX = {'version': None, 'businesses': [], 'checked_at': 0.0}
+
+# In-process LRU cache of rendered summary pages (see get_summary_page):
+# (business_id, updated_at) -> dict, least recently used first
+PAGE_CACHE = OrderedDict()
+
+def summaries_version():
+	"""
+	INPUT: None
+	OUTPUT: tuple (number of summaries, time the latest one was written)
+
+	Cheap fingerprint of the summaries collection, which changes whenever 
+	main.py adds or rewrites a summary (see storage.SummaryWriter). 
+	"""
+
+	latest = db.summaries.find_one({}, {'_id': 0, 'updated_at': 1}, sort=[('updated_at', DESCENDING)])
+	return db.summaries.count(), latest.get('updated_at') if latest else None
+
+def get_business_index():
+	"""
+	INPUT: None
+	OUTPUT: list of dicts (business_id and business_name of every summary, by name)
+
+	Returns the cached business listing, re-reading it (ids and names only) 
+	when the summaries have changed. Checks for changes at most once 
+	every INDEX_CHECK_INTERVAL seconds. 
+	"""
+
+	if time.time() - BUSINESS_INDEX['checked_at'] >= INDEX_CHECK_INTERVAL:
+
+		version = summaries_version()
+
+		if version != BUSINESS_INDEX['version']:
+			projection = {'_id': 0, 'business_id': 1, 'business_name': 1}
+			BUSINESS_INDEX['businesses'] = sorted(db.summaries.find({}, projection), key=lambda b: b['business_name'])
+			BUSINESS_INDEX['version'] = version
+
+		BUSINESS_INDEX['checked_at'] = time.time()
+
+	return BUSINESS_INDEX['businesses']
+
 # ROUTES:
 
 @app.route('/')
@@ -12,14 +69,169 @@ def index():
 
 @app.route('/dashboard')
 def dashboard():
-	# get list of business names/ids from mongo
-	businesses =[b for b in db.summaries.find()]
-	return render_template('index.html.jinja', businesses = businesses)
+	# get (one page of the) list of business names/ids
+	businesses = get_business_index()
+
+	n_pages = max(1, (len(businesses) + DASHBOARD_PAGE_SIZE - 1) // DASHBOARD_PAGE_SIZE)
+	page = request.args.get('page', 1, type=int)
+	if page < 1 or page > n_pages:
+		abort(404)
+
+	start = (page - 1) * DASHBOARD_PAGE_SIZE
+	return render_template('index.html.jinja', businesses=businesses[start:start + DASHBOARD_PAGE_SIZE], page=page, n_pages=n_pages)
+
+def gzip_compress(data):
+	"""
+	INPUT: string
+	OUTPUT: string (gzip-compressed)
+	"""
+
+	buf = cStringIO.StringIO()
+	with gzip.GzipFile(fileobj=buf, mode='wb', compresslevel=6) as f:
+		f.write(data)
+	return buf.getvalue()
+
+def get_aspect_sentences(b_id, aspect, polarities=POLARITIES, offset=0, limit=SENTENCES_SHOWN):
+	"""
+	INPUT: string (business id), string (aspect), list of strings (polarities), 
+		   int (sentences to skip), int (max sentences per polarity)
+	OUTPUT: dict with the aspect's counts ('num_pos', 'num_neg', 'frac_pos') and 
+			a list of sentences (most confident first) for each requested polarity,
+			or None if there's no such aspect
+
+	Fetches only the requested slice: from the summary document (which holds 
+	the top_k sentences per polarity) and, past those, from the overflow 
+	sentences (see storage.SummaryWriter). 
+	"""
+
+	if '.' in aspect or aspect.startswith('$'): # not a valid field name, so not an aspect
+		return None
+
+	field = 'aspect_summary.' + aspect
+	projection = {'_id': 0, 'top_k': 1, field + '.num_pos': 1, field + '.num_neg': 1, field + '.frac_pos': 1}
+	for polarity in polarities:
+		projection[field + '.' + polarity] = {'$slice': [offset, limit]}
+
+	summary = db.summaries.find_one({'business_id': b_id}, projection)
+	if summary is None or aspect not in summary.get('aspect_summary', {}):
+		return None
+
+	asp_summary = summary['aspect_summary'][aspect]
+	top_k = summary.get('top_k') # None for summaries that hold every sentence
+
+	result = {'aspect': aspect,
+			  'num_pos': asp_summary['num_pos'],
+			  'num_neg': asp_summary['num_neg'],
+			  'frac_pos': asp_summary['frac_pos'],
+			  'offset': offset,
+			  'limit': limit}
+
+	for polarity in polarities:
+		sents = asp_summary.get(polarity, [])
+
+		if top_k is not None and len(sents) < limit and offset + limit > top_k:
+			query = {'business_id': b_id, 'aspect': aspect, 'polarity': polarity}
+			sort = [('confidence', DESCENDING), ('_id', DESCENDING)]
+			overflow = db.summary_sentences.find(query, dict([(f, 1) for f in SENTENCE_FIELDS])).sort(sort)
+			sents = sents + list(overflow.skip(max(0, offset - top_k)).limit(limit - len(sents)))
+
+		result[polarity] = [dict([(f, sent[f]) for f in SENTENCE_FIELDS if f in sent]) for sent in sents]
+
+	return result
+
+def get_summary_page(b_id):
+	"""
+	INPUT: string (business id)
+	OUTPUT: dict with the rendered page ('html'), its gzipped version ('gzipped'),
+			an ETag for it ('etag') and the time its summary was written ('updated_at'),
+			or None if there's no summary for this business
+
+	Pages are cached by business id and the updated_at stamp of the summary 
+	(see storage.SummaryWriter), so a rewritten summary is re-rendered. Only
+	that stamp is fetched from Mongo when the page is cached. 
+
+	Only the first aspect's sentences are rendered; the page fetches the 
+	others' from the API (see aspect_sentences) when their tabs are opened.
+	"""
+
+	stamp = db.summaries.find_one({'business_id': b_id}, {'_id': 0, 'updated_at': 1})
+	if stamp is None:
+		return None
+
+	key = (b_id, stamp.get('updated_at'))
+
+	try:
+		page = PAGE_CACHE.pop(key) # re-inserted below as most recently used
+	except KeyError:
+		summary = db.summaries.find_one({'business_id': b_id}, {'_id': 0, 'aspect_summary': 0, 'overflow_sentences': 0})
+		if summary is None:
+			return None
+
+		if 'aspects' not in summary: # written before aspects were listed
+			aspects = db.summaries.find_one({'business_id': b_id}, {'_id': 0, 'aspect_summary': 1})['aspect_summary']
+			summary['aspects'] = sorted(aspects, key=lambda aspect: aspects[aspect]['num_pos'] + aspects[aspect]['num_neg'], reverse=True)
+
+		first = get_aspect_sentences(b_id, summary['aspects'][0]) if summary['aspects'] else None
+
+		html = render_template('summary.html.jinja', summary=summary, first=first, n_shown=SENTENCES_SHOWN).encode('utf-8')
+		page = {'html': html,
+				'gzipped': gzip_compress(html),
+				'etag': hashlib.md5(html).hexdigest(),
+				'updated_at': summary.get('updated_at')}
+
+		# drop pages rendered from older versions of this summary
+		for old_key in [k for k in PAGE_CACHE if k[0] == b_id]:
+			del PAGE_CACHE[old_key]
+
+		if len(PAGE_CACHE) >= PAGE_CACHE_SIZE:
+			PAGE_CACHE.popitem(last=False)
+
+	PAGE_CACHE[key] = page
+	return page
 
 @app.route('/summaries/<b_id>')
 def summary(b_id):
-	summary = db.summaries.find_one({'business_id': b_id})
-	return render_template('summary.html.jinja', summary=summary)
+	page = get_summary_page(b_id)
+	if page is None:
+		abort(404)
+
+	if 'gzip' in request.accept_encodings:
+		response = make_response(page['gzipped'])
+		response.headers['Content-Encoding'] = 'gzip'
+		response.set_etag(page['etag'] + '-gz') # a different representation, so a different tag
+	else:
+		response = make_response(page['html'])
+		response.set_etag(page['etag'])
+
+	response.vary.add('Accept-Encoding')
+	response.cache_control.no_cache = True # may be stored, but must be revalidated
+	if page['updated_at']:
+		response.last_modified = page['updated_at']
+
+	return response.make_conditional(request) # 304 if the client's copy is current
+
+@app.route('/api/summaries/<b_id>/aspects/<path:aspect>')
+def aspect_sentences(b_id, aspect):
+	"""
+	JSON for one aspect of a summary: its counts and a page of its sentences,
+	most confident first, for one polarity (?polarity=pos or neg) or both.
+	Paged with ?offset= and ?limit= (up to MAX_API_LIMIT). 
+	"""
+
+	polarity = request.args.get('polarity')
+	offset = request.args.get('offset', 0, type=int)
+	limit = request.args.get('limit', SENTENCES_SHOWN, type=int)
+
+	if polarity not in POLARITIES + (None,):
+		abort(400)
+	if offset < 0 or not 0 < limit <= MAX_API_LIMIT:
+		abort(400)
+
+	result = get_aspect_sentences(b_id, aspect, (polarity,) if polarity else POLARITIES, offset, limit)
+	if result is None:
+		abort(404)
+
+	return jsonify(result)
 	
 @app.route('/project')
 def project():
@@ -29,10 +241,6 @@ def project():
 def author():
 	return render_template('about.html.jinja', about="Jeff Fossett")
 
-@app.template_filter()
-def less_than_ten(number):
-	return number <= 10
-
 if __name__ == "__main__":
 
 	# Setup db connection
@@ -40,6 +248,4 @@ if __name__ == "__main__":
 	db = client.yelptest2
 	print "Connected to Mongo database"
 
-	app.jinja_env.filters['less_than_ten'] = less_than_ten
-
 	app.run(host='0.0.0.0', port=80, debug=True)
@@ -3,4 +3,45 @@ $(function () {
 	  e.preventDefault();
 	  $(this).tab('show');
 	})
-})
\ No newline at end of file
+
+	// Aspect tabs other than the first are rendered empty; fetch
+	// their sentences from the API the first time they're shown
+	$('a[data-toggle="tab"]').on('shown.bs.tab', function (e) {
+	  var pane = $($(e.target).attr('href'));
+	  var url = pane.data('aspect-url');
+
+	  if (!url || pane.data('loaded')) {
+	    return;
+	  }
+	  pane.data('loaded', true);
+
+	  $.getJSON(url, function (aspect) {
+	    pane.children('p.text-muted').remove();
+	    pane.append(renderAspect(aspect));
+	  }).fail(function () {
+	    pane.data('loaded', false); // try again next time
+	    pane.children('p.text-muted').text('Could not load sentences for this aspect.');
+	  });
+	})
+})
+
+// Same markup as the server-rendered first tab (see summary.html.jinja)
+function renderAspect(aspect) {
+	var progress = $('<div class="progress">').append(
+	  $('<div class="progress-bar progress-bar-success">').css('width', aspect.frac_pos*100 + '%').append($('<span>').text('Positive')),
+	  $('<div class="progress-bar progress-bar-danger">').css('width', 100 - aspect.frac_pos*100 + '%').append($('<span>').text('Negative')));
+
+	return [progress,
+	        $('<h2>').append($('<b>').text('Positive ').append($('<span class="label label-success">').text(aspect.num_pos))),
+	        renderSentences(aspect.pos),
+	        $('<h2>').append($('<b>').text('Negative ').append($('<span class="label label-danger">').text(aspect.num_neg))),
+	        renderSentences(aspect.neg)];
+}
+
+function renderSentences(sents) {
+	var list = $('<ul>');
+	$.each(sents, function (i, sent) {
+	  list.append($('<li>').text(sent.text + ' - ' + sent.user));
+	});
+	return list;
+}
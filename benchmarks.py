@@ -0,0 +1,308 @@
+"""
+benchmarks.py
+
+Timing harnesses for YUMM's summary-generation pipeline. Business
+benchmarks run on a single (by default, the largest) business from 
+processed.csv; sentence benchmarks run on the sentences of a summary 
+JSON file (by default, the bundled Beckett's Table.json); corpus 
+benchmarks run on the text of the first reviews in processed.csv. 
+
+Usage:
+
+	python benchmarks.py <business benchmark> [business_id]
+	python benchmarks.py <sentence benchmark> [path to summary json]
+	python benchmarks.py <corpus benchmark> [number of reviews]
+
+"""
+
+import sys
+import json
+import time
+import resource
+
+def timed(func, *args, **kwargs):
+	"""
+	INPUT: function, arguments
+	OUTPUT: tuple (result of the call, seconds elapsed)
+	"""
+	start = time.time()
+	result = func(*args, **kwargs)
+	return result, time.time() - start
+
+def load_business(bus_id=None):
+	"""
+	INPUT: (optional) business id
+	OUTPUT: Business
+
+	Builds the Business with the given id, or the one with the most
+	reviews if no id is given.
+	"""
+
+	from main import read_data, get_reviews_for_business
+	from classes.business import Business
+
+	df = read_data()
+
+	if bus_id is None:
+		bus_id = df.business_id.value_counts().index[0]
+
+	biz, elapsed = timed(Business, get_reviews_for_business(bus_id, df))
+	print "Built %s (%d reviews, %d sentences) in %.2fs" % (biz, len(biz.reviews), len(biz.sentences), elapsed)
+
+	return biz
+
+def load_summary_sentences(path="Beckett's Table.json"):
+	"""
+	INPUT: (optional) string (path to a summary, as written to Mongo)
+	OUTPUT: list of strings (raw sentences)
+
+	Returns the text of every sentence in the summary, for 
+	benchmarks that work on raw sentences. 
+	"""
+
+	with open(path, 'r') as f:
+		summary = json.load(f)
+
+	return [sent['text'].encode('utf-8') for asp in summary['aspect_summary'].values() for sent in asp['pos'] + asp['neg']]
+
+def load_review_texts(n_reviews=100000):
+	"""
+	INPUT: (optional) int
+	OUTPUT: list of strings (raw review texts)
+	"""
+
+	import pandas as pd
+	from main import DATA_PATH
+
+	return list(pd.read_csv(DATA_PATH, usecols=['text'], nrows=n_reviews).text.dropna())
+
+def bench_aspect_index(biz):
+	"""
+	Compare aspect -> sentence lookup via the token index against a
+	linear scan over every sentence with Sentence.has_aspect.
+	"""
+
+	aspects = biz.extract_aspects()
+
+	_, elapsed = timed(biz.build_token_index, biz.sentences)
+	print "Token index build: %.3fs (%d tokens)" % (elapsed, len(biz.token_index))
+
+	scan = lambda: [[sent for review in biz for sent in review if sent.has_aspect(asp)] for asp in aspects]
+	index = lambda: [biz.get_sents_by_aspect(asp) for asp in aspects]
+
+	scanned, scan_time = timed(scan)
+	indexed, index_time = timed(index)
+
+	assert scanned == indexed, "Index lookup disagrees with linear scan"
+
+	print "Lookup of %d aspects: scan %.3fs, index %.3fs (%.1fx)" % (len(aspects), scan_time, index_time, scan_time / max(index_time, 1e-9))
+
+def peak_rss_mb():
+	"""
+	INPUT: None
+	OUTPUT: float (peak resident set size of this process so far, in MB)
+	"""
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0 # bytes on OS X, KB on Linux
+
+def bench_memory(biz):
+	"""
+	Report the peak RSS of the process after building the business and
+	running the full summary (run on two commits to compare representations).
+	"""
+
+	print "Peak RSS after building business: %.1f MB" % peak_rss_mb()
+
+	_, elapsed = timed(biz.aspect_based_summary)
+	print "Summary in %.2fs; peak RSS: %.1f MB (%d sentences)" % (elapsed, peak_rss_mb(), len(biz.sentences))
+
+def bench_pos_tagging(raw_sents):
+	"""
+	Compare POS tagging throughput (sentences/sec) of calling nltk.pos_tag
+	once per sentence against tagging all sentences in one batch. 
+	"""
+
+	import nltk
+	from classes.sentence import Sentence
+
+	tokenized_sents = [Sentence(raw, stages=('tokenized',)).tokenized for raw in raw_sents]
+	Sentence.get_tagger() # load the tagger outside of the timings
+	nltk.pos_tag(['warm', 'up'])
+
+	per_sentence, per_sentence_time = timed(lambda: [nltk.pos_tag(toks) for toks in tokenized_sents])
+
+	sents = [Sentence(raw, stages=('tokenized',)) for raw in raw_sents]
+	_, batch_time = timed(Sentence.batch_pos_tag, sents)
+
+	assert per_sentence == [sent.pos_tagged for sent in sents], "Batch tagging disagrees with nltk.pos_tag"
+
+	n_sents = float(len(raw_sents))
+	print "POS tagging %d sentences: per-sentence %.0f sents/sec, batch %.0f sents/sec" % (n_sents, n_sents / per_sentence_time, n_sents / batch_time)
+
+def bench_featurize(raw_sents):
+	"""
+	Compare featurizing sentences one dict at a time (Sentence.get_features) 
+	against filling the feature matrix in one batch (Sentence.feature_matrix),
+	and check that the two give identical matrices. 
+	"""
+
+	import numpy as np
+	from classes.sentence import Sentence
+
+	sents = [Sentence(raw) for raw in raw_sents]
+	for i, sent in enumerate(sents):
+		sent.stars = i % 5 + 1 # arbitrary, but varied
+
+	per_sentence, per_sentence_time = timed(lambda: np.vstack([Sentence.FEATURIZER.featurize(sent).values() for sent in sents]))
+	batch, batch_time = timed(Sentence.feature_matrix, sents)
+
+	assert np.array_equal(per_sentence, batch), "Batch featurization disagrees with Sentence.get_features"
+	assert np.array_equal(per_sentence, np.vstack([sent.get_features(asarray=True) for sent in sents]))
+
+	print "Featurizing %d sentences (%d features): per-sentence %.3fs, batch %.3fs" % (len(sents), batch.shape[1], per_sentence_time, batch_time)
+
+def bench_lexicon_scoring(raw_sents):
+	"""
+	Compare the single-pass LexiconFeaturizer against running SubjFeaturizer
+	and LiuFeaturizer separately (with the same lexicons), and check that the
+	two give identical features. 
+	"""
+
+	import numpy as np
+	from classes.sentence import Sentence
+	from classes.transformers.featurizers import MetaFeaturizer
+
+	sents = [Sentence(raw) for raw in raw_sents]
+	for i, sent in enumerate(sents):
+		sent.stars = i % 5 + 1
+
+	single_pass = Sentence.FEATURIZER
+	lexicon_featurizer = single_pass.featurizer_list[0]
+	separate = MetaFeaturizer([lexicon_featurizer.subj, lexicon_featurizer.liu])
+
+	assert separate.feature_names == single_pass.feature_names, "Feature schemas differ"
+
+	separate_X, separate_time = timed(separate.featurize_batch, sents)
+	single_pass_X, single_pass_time = timed(single_pass.featurize_batch, sents)
+
+	assert np.array_equal(separate_X, single_pass_X), "Single-pass features disagree with SubjFeaturizer/LiuFeaturizer"
+
+	print "Lexicon features for %d sentences: separate %.3fs, single pass %.3fs" % (len(sents), separate_time, single_pass_time)
+
+def bench_startup(raw_sents):
+	"""
+	Report the time taken to import the pipeline's classes, to annotate the
+	first sentence (which loads the resources it needs on first use), and to 
+	load each of the remaining resources. Classes are imported only here, so
+	the import is timed from a fresh process. 
+	"""
+
+	_, import_time = timed(__import__, 'classes.business')
+	print "Import classes.business: %.2fs" % import_time
+
+	from classes.sentence import Sentence
+	from classes.transformers import resources
+
+	_, first_time = timed(Sentence, raw_sents[0])
+	print "First sentence: %.2fs" % first_time
+
+	_, preload_time = timed(resources.preload)
+	print "Preload remaining resources: %.2fs" % preload_time
+
+	for name, load_time in sorted(resources.LOAD_TIMES.items()):
+		print "  %s: %.2fs" % (name, load_time)
+
+def bench_svc(raw_sents):
+	"""
+	Compare the pickled sklearn opinion model against its compiled NumPy
+	form (CompiledSVC) on the features of the sentences, and check that 
+	their probabilities agree. 
+	"""
+
+	import pickle
+	import numpy as np
+	from classes.sentence import Sentence
+	from classes.transformers import resources
+	from classes.transformers.svc import CompiledSVC
+
+	with open(resources.path('opinion_model'), 'rb') as f:
+		model = pickle.load(f)
+	compiled = CompiledSVC.from_sklearn(model)
+
+	sents = [Sentence(raw) for raw in raw_sents]
+	for i, sent in enumerate(sents):
+		sent.stars = i % 5 + 1
+	X = Sentence.feature_matrix(sents)
+
+	sklearn_probas, sklearn_time = timed(model.predict_proba, X)
+	compiled_probas, compiled_time = timed(compiled.predict_proba, X)
+
+	max_diff = np.abs(sklearn_probas - compiled_probas).max()
+	assert max_diff < 1e-9, "CompiledSVC disagrees with sklearn (max difference %g)" % max_diff
+
+	print "Opinion model on %d sentences (%d support vectors): sklearn %.3fs, NumPy %.3fs (max difference %g)" % (len(sents), len(compiled.support_vectors), sklearn_time, compiled_time, max_diff)
+
+def bench_tokenizer(texts):
+	"""
+	Compare the original (fast=False) and fast MyPottsTokenizer on review 
+	texts, and check that they tokenize every text identically. 
+	"""
+
+	from classes.transformers.tokenizers import MyPottsTokenizer
+
+	original = MyPottsTokenizer(preserve_case=False, fast=False)
+	fast = MyPottsTokenizer(preserve_case=False)
+
+	original_tokens, original_time = timed(lambda: [original.tokenize(text) for text in texts])
+	fast_tokens, fast_time = timed(fast.tokenize_many, texts)
+
+	mismatches = [text for text, a, b in zip(texts, original_tokens, fast_tokens) if a != b]
+	assert not mismatches, "Fast tokenizer disagrees on %d texts, e.g. %r" % (len(mismatches), mismatches[0])
+
+	n_chars = sum(len(text) for text in texts)
+	print "Tokenizing %d reviews (%.1f MB): original %.2fs, fast %.2fs (%.1fx)" % (len(texts), n_chars / 1e6, original_time, fast_time, original_time / max(fast_time, 1e-9))
+
+def bench_chunker(raw_sents):
+	"""
+	Compare aspect extraction with the compiled NP chunker against nltk's 
+	RegexpParser, and check that they find the same aspects. 
+	"""
+
+	from classes.sentence import Sentence
+
+	sents = [Sentence(raw, stages=('pos_tagged',)) for raw in raw_sents]
+	extractor = Sentence.ASP_EXTRACTOR
+
+	regexp_spans, regexp_time = timed(lambda: [extractor.get_sent_aspect_spans_regexp(sent) for sent in sents])
+	compiled_spans, compiled_time = timed(lambda: [extractor.get_sent_aspect_spans(sent) for sent in sents])
+
+	assert regexp_spans == compiled_spans, "Compiled chunker disagrees with RegexpParser"
+
+	print "Aspects of %d sentences: RegexpParser %.3fs, compiled %.3fs (%.1fx)" % (len(sents), regexp_time, compiled_time, regexp_time / max(compiled_time, 1e-9))
+
+BUSINESS_BENCHMARKS = {'aspect_index': bench_aspect_index,
+					   'memory': bench_memory}
+
+SENTENCE_BENCHMARKS = {'pos_tagging': bench_pos_tagging,
+					   'featurize': bench_featurize,
+					   'lexicon_scoring': bench_lexicon_scoring,
+					   'startup': bench_startup,
+					   'svc': bench_svc,
+					   'chunker': bench_chunker}
+
+CORPUS_BENCHMARKS = {'tokenizer': bench_tokenizer}
+
+if __name__ == "__main__":
+
+	name = sys.argv[1] if len(sys.argv) > 1 else None
+	arg = sys.argv[2] if len(sys.argv) > 2 else None
+
+	if name in BUSINESS_BENCHMARKS:
+		BUSINESS_BENCHMARKS[name](load_business(arg))
+	elif name in SENTENCE_BENCHMARKS:
+		SENTENCE_BENCHMARKS[name](load_summary_sentences(arg) if arg else load_summary_sentences())
+	elif name in CORPUS_BENCHMARKS:
+		CORPUS_BENCHMARKS[name](load_review_texts(int(arg)) if arg else load_review_texts())
+	else:
+		print "Usage: python benchmarks.py <%s> [business_id, path or number of reviews]" % "|".join(sorted(BUSINESS_BENCHMARKS.keys() + SENTENCE_BENCHMARKS.keys() + CORPUS_BENCHMARKS.keys()))
+		sys.exit(1)
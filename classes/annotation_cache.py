@@ -0,0 +1,148 @@
+import os
+import sqlite3
+import hashlib
+import cPickle as pickle
+
+class AnnotationCache(object):
+	"""
+	Class to persist Sentence annotations (tokenization, POS tags, lemmas
+	and candidate aspects) in a single-file SQLite database, so that a
+	sentence seen before--in an earlier run of the pipeline, or in the
+	training data--is not re-annotated.
+
+	Entries are content-addressed: the key is a hash of the raw sentence
+	text together with a version stamp of the annotation pipeline. Entries
+	written under any other version are dropped when the cache is opened,
+	so changing the tokenizer, tagger or chunk grammar invalidates the cache.
+
+	The database connection is opened lazily (and re-opened in a forked
+	child process). Writes are buffered in memory and written every 
+	commit_every entries (or on commit) in one short transaction, so that
+	worker processes sharing the file never hold its write lock for long.
+	If the database is busy or otherwise unavailable, reads are treated as 
+	misses and buffered writes are dropped: the cache is only an optimization.
+	"""
+
+	def __init__(self, path, version, commit_every=500, timeout=10.0):
+		"""
+		INPUT: string (path to database file), string (pipeline version stamp), int, 
+			   float (seconds to wait for another process' write to finish)
+		"""
+
+		self.path = path
+		self.version = version
+		self.commit_every = commit_every
+		self.timeout = timeout
+
+		self.conn = None
+		self.pid = None # process that opened self.conn
+		self.pending = {} # key -> value, written on the next commit
+		self.pending_pid = os.getpid() # process that buffered self.pending
+
+	def connection(self):
+		"""
+		INPUT: AnnotationCache
+		OUTPUT: sqlite3 Connection
+
+		Returns this process' connection to the database, opening it
+		(and dropping stale entries) if needed.
+		"""
+
+		if self.conn is None or self.pid != os.getpid():
+
+			conn = sqlite3.connect(self.path, timeout=self.timeout)
+
+			conn.execute("PRAGMA journal_mode=WAL") # let worker processes read while one writes
+			with conn: # one short transaction
+				conn.execute("CREATE TABLE IF NOT EXISTS annotations (key TEXT PRIMARY KEY, version TEXT, value BLOB)")
+				conn.execute("DELETE FROM annotations WHERE version != ?", (self.version,))
+
+			self.conn = conn # only once it's set up, so a failure here is retried on next use
+			self.pid = os.getpid()
+
+		return self.conn
+
+	def pending_writes(self):
+		"""
+		INPUT: AnnotationCache
+		OUTPUT: dict (this process' buffered writes)
+
+		A forked child starts with an empty buffer; what the parent
+		buffered is the parent's to write. 
+		"""
+
+		if self.pending_pid != os.getpid():
+			self.pending = {}
+			self.pending_pid = os.getpid()
+
+		return self.pending
+
+	def key(self, raw):
+		"""
+		INPUT: AnnotationCache, string (raw text of sentence)
+		OUTPUT: string (hex digest)
+		"""
+
+		if isinstance(raw, unicode):
+			raw = raw.encode('utf-8')
+
+		return hashlib.sha1(self.version + '\0' + raw).hexdigest()
+
+	def get(self, raw):
+		"""
+		INPUT: AnnotationCache, string (raw text of sentence)
+		OUTPUT: dict of annotations, or None if not cached
+		"""
+
+		key = self.key(raw)
+		value = self.pending_writes().get(key)
+
+		if value is None:
+			try:
+				row = self.connection().execute("SELECT value FROM annotations WHERE key = ?", (key,)).fetchone()
+			except sqlite3.OperationalError: # e.g. locked; treat as a miss
+				return None
+
+			if row is None:
+				return None
+
+			value = row[0]
+
+		return pickle.loads(str(value))
+
+	def put(self, raw, annotations):
+		"""
+		INPUT: AnnotationCache, string (raw text of sentence), dict of annotations
+		OUTPUT: None
+		"""
+
+		pending = self.pending_writes()
+		pending[self.key(raw)] = sqlite3.Binary(pickle.dumps(annotations, pickle.HIGHEST_PROTOCOL))
+
+		if len(pending) >= self.commit_every:
+			self.commit()
+
+	def commit(self):
+		"""
+		INPUT: AnnotationCache
+		OUTPUT: None
+
+		Write any buffered entries, in a single transaction. If the database
+		stays locked (by another process) for longer than the timeout, the 
+		entries are dropped rather than retried. 
+		"""
+
+		pending = self.pending_writes()
+
+		if not pending:
+			return
+
+		rows = [(key, self.version, value) for key, value in pending.iteritems()]
+		self.pending = {}
+
+		try:
+			conn = self.connection()
+			with conn: # commits, or rolls back on error
+				conn.executemany("INSERT OR REPLACE INTO annotations VALUES (?, ?, ?)", rows)
+		except sqlite3.OperationalError:
+			pass
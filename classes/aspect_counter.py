@@ -0,0 +1,84 @@
+from __future__ import division
+
+import math
+
+class AspectCounter(object):
+	"""
+	Class to count candidate aspects (strings) in a stream, in bounded memory,
+	using lossy counting (Manku & Motwani, "Approximate Frequency Counts over
+	Data Streams", VLDB 2002).
+
+	After n items have been added, the counter holds every item that occurred
+	more than epsilon * n times, with a count that is at most epsilon * n below
+	its true count. Rarer items are pruned as the stream goes, so that about
+	(1 / epsilon) * log(epsilon * n) items are held at once.
+	"""
+
+	def __init__(self, epsilon=1e-4):
+		"""
+		INPUT: AspectCounter, float (max error, as a fraction of items added)
+		"""
+
+		self.epsilon = epsilon
+		self.bucket_width = int(math.ceil(1 / epsilon))
+
+		self.entries = {} # item -> [count since it was last inserted, max count missed before that]
+		self.n = 0 # number of items added
+
+	def add(self, item):
+		"""
+		INPUT: AspectCounter, string
+		OUTPUT: None
+		"""
+
+		self.n += 1
+
+		entry = self.entries.get(item)
+
+		if entry is None:
+			self.entries[item] = [1, self.current_bucket() - 1]
+		else:
+			entry[0] += 1
+
+		if self.n % self.bucket_width == 0:
+			self.prune()
+
+	def current_bucket(self):
+		"""
+		INPUT: AspectCounter
+		OUTPUT: int (id of the bucket of bucket_width items that the stream is in)
+		"""
+		return int(math.ceil(self.n / self.bucket_width))
+
+	def prune(self):
+		"""
+		INPUT: AspectCounter
+		OUTPUT: None
+
+		Drop the items that can't have occurred more than once per bucket so far.
+		"""
+
+		bucket = self.current_bucket()
+
+		for item, (count, error) in self.entries.items():
+			if count + error <= bucket:
+				del self.entries[item]
+
+	def upper_bounds(self):
+		"""
+		INPUT: AspectCounter
+		OUTPUT: generator of (item, int) tuples (the items held, with an
+				upper bound on each one's true count)
+		"""
+		return ((item, count + error) for item, (count, error) in self.entries.iteritems())
+
+	def max_error(self):
+		"""
+		INPUT: AspectCounter
+		OUTPUT: int (most that any item held can have been undercounted by,
+				and most that any item not held can have occurred)
+		"""
+		return int(self.epsilon * self.n)
+
+	def __len__(self):
+		return len(self.entries)
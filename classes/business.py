@@ -1,10 +1,15 @@
 from __future__ import division
 
 from review import Review
+from sentence import Sentence
+from score_cache import ScoreCache
+from aspect_counter import AspectCounter
 from collections import Counter
 from operator import itemgetter
+import heapq
 
 from transformers.sentiment import SentimentModel, OpinionModel
+from transformers import resources
 
 class Business(object):
 	"""
@@ -17,7 +22,30 @@ class Business(object):
 	SENTIMENT_MODEL = SentimentModel()
 	OPINION_MODEL = OpinionModel()
 
-	def __init__(self, review_df):
+	# Stored per-review analyses (see encode_new_reviews) are stamped with current_analysis_version,
+	# which changes with this, the Sentence annotation pipeline and the files below; bump 
+	# this whenever anything else that goes into an analysis (e.g. its encoding) changes
+	ANALYSIS_VERSION = 3
+
+	# Resources whose files determine the model scores in an analysis (see resources.PATHS)
+	SCORING_RESOURCES = ('sentiment_model', 'opinion_model', 'subj_lexicon', 'liu_lexicons')
+
+	# Sentence annotation stages needed for every sentence (to find aspects), and
+	# for those that get scored (to featurize); see Sentence.STAGES
+	ANNOTATION_STAGES = ('aspects',)
+	SCORING_STAGES = ('lemmatized',)
+
+	SENTENCE_LEN_THRESHOLD = 30 # number of words; longer sentences never make the summary
+	SCORING_CHUNK_SIZE = 1000 # number of sentences per predict_proba call
+
+	SUMMARY_TOP_K = 10 # sentences per aspect and polarity kept in the summary itself (the rest overflow)
+	SUMMARY_PROB_DIGITS = 4 # model scores are rounded to this many digits in the summary
+
+	# Max error of the candidate aspect counts, as a fraction of aspects counted (see AspectCounter).
+	# extract_aspects is exact while this is below threshold * sentences / aspects counted
+	ASPECT_COUNT_EPSILON = 1e-4
+
+	def __init__(self, review_df, stored_analyses=None):
 		"""
 		INPUT: pandas DataFrame with each row a review, and columns:
 
@@ -40,6 +68,10 @@ class Business(object):
 		each row corresponds to a particular review of the Business, and 
 			1. Stores all the metadata associated with the Business
 			2. Converts the reviews (rows) into Review objects. 
+
+		Optionally takes a dict mapping review_id to that review's stored analysis 
+		(see encode_new_reviews). Reviews with a current stored analysis are rebuilt
+		from it rather than processed from scratch. 
 		"""
 
 		# Ensure only got data about *one* Business
@@ -52,8 +84,68 @@ class Business(object):
 		self.categories = review_df.business_categories.iloc[0].split('<CAT>') #list of strings
 		self.ambiance = review_df.business_ambiance.iloc[0].split('<AMB>') #list of strings
 
-		# Create the list of Reviews for this Business
-		self.reviews = [Review(dict(review_row), business=self) for _,review_row in review_df.iterrows()]
+		# Create the list of Reviews for this Business (itertuples avoids building a Series per row)
+		columns = list(review_df.columns)
+		stored_analyses = stored_analyses or {}
+
+		self.reviews = []
+		self.new_reviews = [] # reviews that had no (current) stored analysis
+		restored = [] # (Review, stored analysis) pairs
+
+		self.analysis_version = Business.current_analysis_version() if stored_analyses else None
+
+		for review_row in review_df.itertuples(index=False):
+			review_dict = dict(zip(columns, review_row))
+			analysis = stored_analyses.get(review_dict['review_id'])
+
+			if analysis and analysis.get('version') == self.analysis_version:
+				review = Review.from_analysis(analysis, business=self)
+				restored.append((review, analysis))
+			else:
+				review = Review(review_dict, business=self, stages=())
+				self.new_reviews.append(review)
+
+			self.reviews.append(review)
+
+		# Annotate the new sentences: POS tag them all in one batch, then the remaining stages
+		new_sents = [sent for review in self.new_reviews for sent in review]
+		Sentence.batch_pos_tag(new_sents)
+		for sent in new_sents:
+			sent.annotate(Business.ANNOTATION_STAGES)
+
+		# Count candidate aspects review by review, in bounded memory (see extract_aspects)
+		self.n_sents = 0
+		self.single_asp_counter = AspectCounter(Business.ASPECT_COUNT_EPSILON)
+		self.multi_asp_counter = AspectCounter(Business.ASPECT_COUNT_EPSILON)
+
+		for review in self:
+			self.count_aspects(review)
+
+		# Flat list of all sentences (a sentence's id is its position here),
+		# and an inverted index mapping each token to the ids of the sentences containing it
+		self.sentences = [sent for review in self for sent in review]
+		self.token_index = self.build_token_index(self.sentences)
+
+		# model scores for sentences, filled by score_sentences (and from stored analyses)
+		self.score_cache = ScoreCache()
+
+		for review, analysis in restored:
+			for sent, sent_analysis in zip(review, analysis['sentences']):
+				if 'prob_opin' in sent_analysis:
+					self.score_cache.put(sent, sent_analysis['prob_opin'], sent_analysis['prob_pos'], scored=False)
+
+	@classmethod
+	def current_analysis_version(cls):
+		"""
+		INPUT: Business class
+		OUTPUT: string
+
+		Version stamp for stored analyses: a stored analysis is only reused if
+		it has the current stamp. Covers the Sentence annotation pipeline (see
+		Sentence.pipeline_version) and the model and lexicon files the scores
+		come from, so that replacing e.g. opin_pred.p invalidates old analyses.
+		"""
+		return "%d-%s-%s" % (cls.ANALYSIS_VERSION, Sentence.pipeline_version(), resources.fingerprint(cls.SCORING_RESOURCES))
 
 	def __iter__(self):
 		"""
@@ -85,19 +177,49 @@ class Business(object):
 		containing everything (in correct orders) that will be displayed by
 		the front end. 
 
+		'aspects' lists the aspects in display order. Each aspect holds only its 
+		top SUMMARY_TOP_K ('top_k') sentences per polarity. The rest are returned 
+		under 'overflow_sentences', as a list of dicts each with the business_id, 
+		aspect, polarity and confidence (model probability of that polarity) of 
+		a sentence, to be stored separately (see storage.SummaryWriter).
+
 		Note: This is the highest level analytical method--effectively "runs" the full
 		analysis for this Business. 
 		"""
 
 		aspects = self.extract_aspects()
-		asp_dict = dict([(aspect, self.aspect_summary(aspect)) for aspect in aspects])			
+		aspect_sents = dict([(aspect, self.get_sents_by_aspect(aspect)) for aspect in aspects])
+
+		# score every candidate sentence once, up front, in batch
+		candidates = set([sent for sents in aspect_sents.values() for sent in sents 
+						  if sent.n_tokens <= Business.SENTENCE_LEN_THRESHOLD])
+		self.score_sentences(list(candidates))
+
+		asp_dict = dict([(aspect, self.aspect_summary(aspect, aspect_sents[aspect])) for aspect in aspects])
 
 		asp_dict = self.filter_asp_dict(asp_dict) # final filtering
 
+		overflow_sents = []
+
+		for aspect, asp_summary in asp_dict.iteritems():
+			for polarity, sents in asp_summary.pop('overflow').iteritems():
+				for sent_dict in sents:
+					sent_dict.update({'business_id': self.business_id, 
+									  'aspect': aspect, 
+									  'polarity': polarity, 
+									  'confidence': sent_dict['prob_' + polarity]})
+					overflow_sents.append(sent_dict)
+
+		# aspects in display order: most sentences first
+		aspect_order = sorted(asp_dict, key=lambda aspect: asp_dict[aspect]['num_pos'] + asp_dict[aspect]['num_neg'], reverse=True)
+
 		return {'business_id': self.business_id,
 				'business_name': self.business_name,
 				'business_stars': self.overall_stars,
-				'aspect_summary': asp_dict	
+				'aspects': aspect_order,
+				'top_k': Business.SUMMARY_TOP_K,
+				'aspect_summary': asp_dict,
+				'overflow_sentences': overflow_sents
 				}
 
 	def extract_aspects(self, single_word_thresh=0.012, multi_word_thresh=0.003):
@@ -117,28 +239,33 @@ class Business(object):
 		inclusion in the summary is determined by frequency of occurrence across sentences. Note that different
 		inclusion thresholds are used for single- and multi-word aspects, as the former tend to be much more 
 		noisy (and so higher threshold is needed for high precision).
+
+		Candidates are taken from the approximate counts kept by count_aspects, then
+		counted exactly. Every aspect above threshold is a candidate as long as the 
+		counters' max error is below threshold * number of sentences.
 		"""
 
-		# Get all the candidate aspects in each sentence
-		asp_sents = [sent.aspects for rev in self for sent in rev]
-		n_sents = float(len(asp_sents))
+		n_sents = float(self.n_sents)
 
-		single_asps = [] #list of lists (aspects)
-		multi_asps = [] #list of lists
+		# Aspects that may be common enough, by their upper-bound counts
+		single_cands = set([asp for asp, count in self.single_asp_counter.upper_bounds() if count/n_sents > single_word_thresh])
+		multi_cands = set([asp for asp, count in self.multi_asp_counter.upper_bounds() if count/n_sents > multi_word_thresh])
 
-		# create single-word and multi-word aspect lists
-		for sent in asp_sents: 
-			for asp in sent:
-				if len(asp) == 1:
-					single_asps.append(" ".join(asp))
-				elif len(asp) > 1:
-					multi_asps.append(" ".join(asp))
-				else:
-					assert(False), "something wrong with aspect extraction" # shouldn't happen
+		# Count just those exactly
+		single_counts = Counter()
+		multi_counts = Counter()
+
+		for sent in self.sentences:
+			for asp in sent.aspects:
+				asp = " ".join(asp)
+				if asp in single_cands:
+					single_counts[asp] += 1
+				elif asp in multi_cands:
+					multi_counts[asp] += 1
 
 		# Get sufficiently-common single- and multi-word aspects
-		single_asps = [(asp, count) for asp, count in Counter(single_asps).most_common(30) if count/n_sents > single_word_thresh]
-		multi_asps = [(asp, count) for asp, count in Counter(multi_asps).most_common(30) if count/n_sents > multi_word_thresh]
+		single_asps = [(asp, count) for asp, count in single_counts.most_common(30) if count/n_sents > single_word_thresh]
+		multi_asps = [(asp, count) for asp, count in multi_counts.most_common(30) if count/n_sents > multi_word_thresh]
 
 		# filter redundant single-word aspects
 		single_asps = self.filter_single_asps(single_asps, multi_asps)
@@ -148,15 +275,76 @@ class Business(object):
 
 		return self.filter_all_asps(all_asps)
 
-	def aspect_summary(self, aspect):
+	def count_aspects(self, review):
+		"""
+		INPUT: Business, Review
+		OUTPUT: None
+
+		Adds the candidate aspects in this review's sentences to the 
+		single- and multi-word aspect counters. 
+		"""
+
+		for sent in review:
+			self.n_sents += 1
+			for asp in sent.aspects:
+				if len(asp) == 1:
+					self.single_asp_counter.add(asp[0])
+				elif len(asp) > 1:
+					self.multi_asp_counter.add(" ".join(asp))
+				else:
+					assert(False), "something wrong with aspect extraction" # shouldn't happen
+
+	def score_sentences(self, sents):
+		"""
+		INPUT: Business, list of Sentence objects
+		OUTPUT: None
+
+		Runs the opinion and sentiment models in batch over those of the given 
+		sentences that haven't been scored yet, and stores the results in the score cache.
 		"""
-		INPUT: business, string (aspect)
+
+		sents = [sent for sent in sents if sent not in self.score_cache]
+
+		for sent in sents:
+			sent.annotate(Business.SCORING_STAGES)
+
+		X = Sentence.feature_matrix(sents) # shared by both models
+
+		probs_opin = Business.OPINION_MODEL.get_opinionated_probas(sents, chunk_size=Business.SCORING_CHUNK_SIZE, X=X)
+		probs_pos = Business.SENTIMENT_MODEL.get_positive_probas(sents, chunk_size=Business.SCORING_CHUNK_SIZE, X=X)
+
+		for sent, prob_opin, prob_pos in zip(sents, probs_opin, probs_pos):
+			self.score_cache.put(sent, float(prob_opin), float(prob_pos))
+
+	def get_scored_sentence(self, sent):
+		"""
+		INPUT: Business, Sentence
+		OUTPUT: dict (encoded sentence, with model scores)
+
+		Returns the scored encoding of this sentence from the score cache,
+		scoring it now if it wasn't scored up front. 
+		"""
+
+		entry = self.score_cache.get(sent)
+
+		if entry is None:
+			self.score_sentences([sent])
+			entry = self.score_cache.get(sent)
+
+		return dict(entry) # copy, since the same sentence can appear under several aspects
+
+	def aspect_summary(self, aspect, aspect_sents=None, top_k=None):
+		"""
+		INPUT: business, string (aspect), (optional) list of Sentences mentioning the aspect,
+			   (optional) int (number of sentences to keep per polarity; default SUMMARY_TOP_K)
 		OUTPUT: dict with keys 'pos' and 'neg' which 
 		map to a list of positive sentences (strings) and
 		a list of negative sentences (strings) correspondingly. 
 		
 		Gets summary for a *particular* aspect. Summary includes primarily
-		the sorted positive/negative sentences mentioning this apsect.
+		the sorted positive/negative sentences mentioning this apsect. Only the
+		top_k most confident sentences of each polarity are kept under 'pos'/'neg';
+		the rest are under 'overflow' (unsorted), by polarity. 
 		"""
 
 		OPIN_THRESH = 0.75
@@ -169,27 +357,21 @@ class Business(object):
 		# sentiment classifier is REALLY sure. 
 		SENTI_OVERRIDE_THRESHOLD = .95 
 
-		SENTENCE_LEN_THRESHOLD = 30 # number of words
-
 		pos_sents = []
 		neg_sents = []
 
-		aspect_sents = self.get_sents_by_aspect(aspect)
+		if aspect_sents is None:
+			aspect_sents = self.get_sents_by_aspect(aspect)
 
 		for sent in aspect_sents:
 
-			if len(sent.tokenized) > SENTENCE_LEN_THRESHOLD:
+			if sent.n_tokens > Business.SENTENCE_LEN_THRESHOLD:
 				continue #filter really long sentences
 
-			prob_opin = Business.OPINION_MODEL.get_opinionated_proba(sent)
-			prob_pos = Business.SENTIMENT_MODEL.get_positive_proba(sent)
-			prob_neg = 1 - prob_pos
-
-			sent_dict = sent.encode()
-			sent_dict['prob_opin'] = prob_opin
-			sent_dict['prob_pos'] = prob_pos
-			sent_dict['prob_neg'] = prob_neg
-			sent_dict['sorter'] = prob_opin*max(prob_pos, prob_neg) #used to order sentences for display
+			sent_dict = self.get_scored_sentence(sent)
+			prob_opin = sent_dict['prob_opin']
+			prob_pos = sent_dict['prob_pos']
+			prob_neg = sent_dict['prob_neg']
 
 			if prob_opin > OPIN_THRESH or (max(prob_pos, prob_neg) > SENTI_OVERRIDE_THRESHOLD and prob_opin > HARD_MIN_OPIN_THRESH):
 
@@ -200,30 +382,117 @@ class Business(object):
 
 		n_sents = len(pos_sents) + len(neg_sents) if len(pos_sents) + len(neg_sents) > 0 else 1
 
-		return {'pos': sorted(pos_sents, key=itemgetter('prob_pos'), reverse=True), # sort by confidence
-				'neg': sorted(neg_sents, key=itemgetter('prob_neg'), reverse=True), # sort by confidence
+		top_k = Business.SUMMARY_TOP_K if top_k is None else top_k
+
+		top_pos, overflow_pos = self.top_sentences(pos_sents, 'prob_pos', top_k)
+		top_neg, overflow_neg = self.top_sentences(neg_sents, 'prob_neg', top_k)
+
+		return {'pos': top_pos,
+				'neg': top_neg,
 				'num_pos': len(pos_sents),
 				'num_neg': len(neg_sents),
-				'frac_pos': len(pos_sents) / n_sents
+				'frac_pos': len(pos_sents) / n_sents,
+				'overflow': {'pos': overflow_pos, 'neg': overflow_neg}
 				}
 
+	def top_sentences(self, sent_dicts, key, k):
+		"""
+		INPUT: Business, list of dicts (scored sentences), string (score to rank by), int
+		OUTPUT: tuple of (list of the k highest-scoring dicts, highest first; 
+				list of the rest, in their original order)
+
+		Selects the top k with a heap rather than sorting the whole list (same 
+		result as sorting, stably, by descending score). Scores are then rounded 
+		(see SUMMARY_PROB_DIGITS) for storage. 
+		"""
+
+		ranked = heapq.nlargest(k, enumerate(sent_dicts), key=lambda (_, sent_dict): sent_dict[key])
+		top_ids = set([i for i, _ in ranked])
+
+		for sent_dict in sent_dicts:
+			for prob in ('prob_opin', 'prob_pos', 'prob_neg', 'sorter'):
+				sent_dict[prob] = round(sent_dict[prob], Business.SUMMARY_PROB_DIGITS)
+
+		return [sent_dict for _, sent_dict in ranked], [sent_dict for i, sent_dict in enumerate(sent_dicts) if i not in top_ids]
+
+	def build_token_index(self, sentences):
+		"""
+		INPUT: Business, list of Sentence objects
+		OUTPUT: dict mapping string (token) to list of ints (sentence ids)
+
+		Builds the token -> sentence id postings used to look up the
+		sentences that mention an aspect. Postings are in ascending id order. 
+		"""
+
+		token_index = {}
+
+		for sent_id, sent in enumerate(sentences):
+			for tok in set(sent.tokenized):
+				token_index.setdefault(tok, []).append(sent_id)
+
+		return token_index
+
 	def get_sents_by_aspect(self, aspect):
 		"""
 		INPUT: Business, string (aspect)  
 		OUTPUT: List of Sentence objects
+
+		Returns (in order) the sentences that contain every token of the aspect, 
+		by intersecting the postings of the aspect's tokens. Same result as 
+		checking Sentence.has_aspect on every sentence. 
 		"""
-		return [sent for review in self for sent in review if sent.has_aspect(aspect)] 
+
+		postings = [self.token_index.get(tok, []) for tok in set(aspect.split(" "))]
+		postings.sort(key=len) # start from the rarest token
+
+		sent_ids = set(postings[0])
+		for posting in postings[1:]:
+			if not sent_ids:
+				break
+			sent_ids.intersection_update(posting)
+
+		return [self.sentences[sent_id] for sent_id in sorted(sent_ids)]
+
+	def encode_new_reviews(self):
+		"""
+		INPUT: Business
+		OUTPUT: list of dicts
+
+		Returns the analyses of the reviews that were processed from scratch,
+		ready to be stored (keyed by review_id) and passed back in as 
+		stored_analyses on a later run. Every sentence short enough to 
+		make the summary is scored (in batch) first, so stored reviews 
+		never need to be re-featurized. 
+		"""
+
+		self.score_sentences([sent for review in self.new_reviews for sent in review 
+							  if sent.n_tokens <= Business.SENTENCE_LEN_THRESHOLD])
+
+		analyses = []
+		version = self.analysis_version or Business.current_analysis_version()
+
+		for review in self.new_reviews:
+			analysis = review.encode_analysis(self.score_cache)
+			analysis['business_id'] = self.business_id
+			analysis['version'] = version
+			analyses.append(analysis)
+
+		return analyses
 
 	def filter_single_asps(self, single_asps, multi_asps):
 		"""
-		INPUT: list of strings (aspects)
-		OUTPUT: list of strings (filtered aspects)
+		INPUT: Business, list of (string, int) tuples (single-word aspects, counts), 
+			   list of (string, int) tuples (multi-word aspects, counts)
+		OUTPUT: list of (string, int) tuples (filtered single-word aspects, counts)
 
 		Filter out those one-word aspects that are subsumed in a multi-word aspect. E.g. 
-		filter out "chicken" if "pesto chicken" is a multi-word aspect. 
+		filter out "chicken" if "pesto chicken" is a multi-word aspect (but not "tea" if 
+		"steak" is). 
 		"""
 
-		return [(sing_asp, count) for sing_asp, count in single_asps if not any([sing_asp in mult_asp for mult_asp, _ in multi_asps])]
+		multi_tokens = set([tok for mult_asp, _ in multi_asps for tok in mult_asp.split(" ")])
+
+		return [(sing_asp, count) for sing_asp, count in single_asps if sing_asp not in multi_tokens]
 
 	def filter_asp_dict(self, asp_dict, num_valid_threshold = 5):
 		"""
@@ -1,5 +1,9 @@
 import nltk
+import weakref
 from sentence import Sentence
+from transformers.resources import Resource, register, path
+
+register('sent_tokenizer', lambda: nltk.data.load(path('sent_tokenizer')), paths=['sent_tokenizer'])
 
 class Review(object):
 	"""
@@ -7,14 +11,19 @@ class Review(object):
 	how many stars did they give, etc.). Also manages sentence tokenization and 
 	creates a list of sentence objects upon initialization. Iterating over a Review 
 	object iterates over the constituent sentence objects. 
+
+	The reference back to the Business is weak (the Business holds its Reviews). 
 	"""
 
+	__slots__ = ('review_id', 'user_id', 'user_name', 'stars', 'text', 'sentences', '_business', '__weakref__')
+
 	# Tokenizer for converting a review to a list of sentences. 
-	SENT_TOKENIZER = nltk.data.load('tokenizers/punkt/english.pickle')
+	SENT_TOKENIZER = Resource('sent_tokenizer') # loaded on first use
 
-	def __init__(self, review_dict, business=None):
+	def __init__(self, review_dict, business=None, stages=Sentence.STAGES):
 		"""
-		INPUT: dict corresponding to one row of pd DataFrame of reviews (data for one review) 
+		INPUT: dict corresponding to one row of pd DataFrame of reviews (data for one review),
+			   (optional) Business, (optional) list of Sentence annotation stages to compute up front
 
 		- Maps metadata to class attributes. 
 		- Converts raw text into a list of sentences w/tokenizer. 
@@ -32,16 +41,68 @@ class Review(object):
 			self.business = business
 
 		# Create the list of sentences for this review
-		self.sentences = self.sentence_tokenize(self.text)
+		self.sentences = self.sentence_tokenize(self.text, stages)
+
+	@classmethod
+	def from_analysis(cls, analysis, business=None):
+		"""
+		INPUT: dict (stored analysis of a review, see encode_analysis), (optional) Business
+		OUTPUT: Review
+
+		Rebuilds a previously-analyzed Review from its stored analysis, 
+		without re-running sentence tokenization or any Sentence processing. 
+		"""
+
+		review = cls.__new__(cls)
+
+		review.review_id = analysis['review_id']
+		review.user_id = analysis['user_id']
+		review.user_name = analysis['user_name']
+		review.stars = int(analysis['stars'])
+
+		if business:
+			review.business = business
+
+		review.sentences = [Sentence.from_analysis(sent, review=review) for sent in analysis['sentences']]
+		review.text = " ".join([sent.raw for sent in review.sentences])
+
+		return review
+
+	def encode_analysis(self, score_cache):
+		"""
+		INPUT: Review, ScoreCache
+		OUTPUT: dict
+
+		Encodes this review's metadata and the analysis of its sentences
+		(including any model scores in score_cache) for storage, so that 
+		it can be rebuilt later with Review.from_analysis. 
+		"""
+		return {'review_id': self.review_id,
+				'user_id': self.user_id,
+				'user_name': self.user_name,
+				'stars': self.stars,
+				'sentences': [sent.encode_analysis(score_cache.entries.get(sent)) for sent in self]
+				}
+
+	@property
+	def business(self):
+		"""
+		The Business this review is about (or None)
+		"""
+		return self._business() if getattr(self, '_business', None) else None
+
+	@business.setter
+	def business(self, business):
+		self._business = weakref.ref(business)
 
-	def sentence_tokenize(self, review_text):
+	def sentence_tokenize(self, review_text, stages=Sentence.STAGES):
 		"""
-		INPUT: String (full raw text of review)
+		INPUT: String (full raw text of review), (optional) list of annotation stages
 		OUTPUT: List of Sentence objects
 
 		Convert the raw text of a review to a list of sentence objects. 
 		"""	
-		return [Sentence(sent, review=self) for sent in  Review.SENT_TOKENIZER.tokenize(review_text)]
+		return [Sentence(sent, review=self, stages=stages) for sent in  Review.SENT_TOKENIZER.tokenize(review_text)]
 
 	def __iter__(self):
 		"""
@@ -0,0 +1,76 @@
+class ScoreCache(object):
+	"""
+	Class to memoize the opinion/sentiment model output for the sentences
+	of a Business. Entries are keyed by sentence identity (i.e. the Sentence
+	object itself), so a sentence that mentions several aspects is scored
+	and encoded only once per summary run. Keeps hit/miss counters so that
+	the amount of re-use can be reported: a miss is a sentence that had to
+	be scored, a hit is a read of a sentence that was already read before
+	(i.e. for another aspect).
+	"""
+
+	def __init__(self):
+		self.entries = {} # Sentence -> dict (encoded, scored sentence)
+		self.served = set() # sentences read at least once
+		self.hits = 0
+		self.misses = 0
+
+	def get(self, sent):
+		"""
+		INPUT: ScoreCache, Sentence
+		OUTPUT: dict or None
+
+		Returns the cached entry for this sentence (or None if it has not
+		been scored yet). Only a repeat read counts as a hit; the first
+		read of a sentence is its first use, not re-use.
+		"""
+
+		entry = self.entries.get(sent)
+
+		if entry is not None:
+			if sent in self.served:
+				self.hits += 1
+			else:
+				self.served.add(sent)
+
+		return entry
+
+	def put(self, sent, prob_opin, prob_pos, scored=True):
+		"""
+		INPUT: ScoreCache, Sentence, float, float, (optional) boolean (False if 
+			   the scores were restored from a stored analysis rather than computed)
+		OUTPUT: dict (the new entry)
+
+		Stores the model scores for this sentence, along with its
+		encoding for the database. A sentence scored now counts as a miss. 
+		"""
+
+		prob_neg = 1 - prob_pos
+
+		entry = sent.encode()
+		entry['prob_opin'] = prob_opin
+		entry['prob_pos'] = prob_pos
+		entry['prob_neg'] = prob_neg
+		entry['sorter'] = prob_opin*max(prob_pos, prob_neg) #used to order sentences for display
+
+		self.entries[sent] = entry
+
+		if scored:
+			self.misses += 1
+
+		return entry
+
+	def __contains__(self, sent):
+		return sent in self.entries
+
+	def __len__(self):
+		return len(self.entries)
+
+	def __str__(self):
+		"""
+		INPUT: ScoreCache
+		OUTPUT: string
+
+		Return a short report of cache usage
+		"""
+		return "%d sentences cached, %d hits, %d misses" % (len(self), self.hits, self.misses)
@@ -1,43 +1,97 @@
 import nltk
+import weakref
+import hashlib
 import numpy as np
 
-from nltk.stem.wordnet import WordNetLemmatizer
+from array import array
 
-from transformers.tokenizers import MyPottsTokenizer
-from transformers.featurizers import MetaFeaturizer, SubjFeaturizer, LiuFeaturizer
+from vocabulary import Vocabulary
+from annotation_cache import AnnotationCache
+from transformers.tokenizers import MyPottsTokenizer, word_re
+from transformers.lemmatizers import CachedLemmatizer
+from transformers.featurizers import MetaFeaturizer, SubjFeaturizer, LiuFeaturizer, LexiconFeaturizer
 from transformers.asp_extractors import SentenceAspectExtractor
+from transformers.resources import Resource, register, preload
+
+def load_pos_tagger():
+	"""
+	INPUT: None
+	OUTPUT: NLTK tagger (the standard one, i.e. the one used by nltk.pos_tag)
+	"""
+
+	if hasattr(nltk.tag, '_POS_TAGGER'):
+		return nltk.data.load(nltk.tag._POS_TAGGER) # pickled tagger (NLTK 2.x/3.0)
+	else:
+		return nltk.tag.PerceptronTagger()
+
+register('pos_tagger', load_pos_tagger)
+register('featurizer', lambda: MetaFeaturizer([LexiconFeaturizer(SubjFeaturizer(), LiuFeaturizer())]), paths=['subj_lexicon', 'liu_lexicons'])
 
 class Sentence(object):
 	"""
 	Class corresponding to a sentence in a review. Stores/manages word tokenization,
 	part of speech (POS)tagging and lemmatization as well as some components
 	of the final analysis such as aspect extraction. 
+
+	To keep large businesses in memory, a Sentence stores its tokens, tags and 
+	lemmas as arrays of interned ids and its aspects as token spans; the usual 
+	tokenized/pos_tagged/lemmatized/aspects lists are built from these on access. 
+	The reference back to the Review is weak (the Business holds the Reviews). 
+
+	Each annotation stage is computed the first time it is accessed (along with 
+	the stages it depends on); stages passed to __init__ are computed up front.
 	"""
 
+	__slots__ = ('raw', 'token_ids', 'tag_ids', 'lemma_ids', 'span_offsets', 'stars', 'features', '_review')
+
+	# Interning tables for tokens/lemmas and POS tags
+	TOKENS = Vocabulary('i')
+	TAGS = Vocabulary('H')
+
 	# Tokenizer for converting a raw string (sentence) to a list of strings (words)
 	WORD_TOKENIZER = MyPottsTokenizer(preserve_case=False)
 	
-	# Lemmatizer
-	LEMMATIZER = WordNetLemmatizer()
+	# POS tagger (the standard NLTK tagger, loaded on first use)
+	TAGGER = Resource('pos_tagger')
+
+	# Lemmatizer (memoizes WordNet lemmas; see use_lemma_table)
+	LEMMATIZER = CachedLemmatizer()
 
 	# Featurizer
-	FEATURIZER = MetaFeaturizer([SubjFeaturizer(), LiuFeaturizer()]) #combine two featurizer objects
+	FEATURIZER = Resource('featurizer') # both featurizers' features, in one pass (loaded on first use)
 
 	# Aspect Extractor
 	ASP_EXTRACTOR = SentenceAspectExtractor()
 
-	def __init__(self, raw, review=None):
-		"""
-		INPUT: string (raw text of sentence), (optional) Review object
+	# On-disk cache of annotations (see use_annotation_cache); None means no caching
+	ANNOTATION_CACHE = None
+
+	# Bump whenever the way a Sentence annotates itself changes (invalidates the annotation cache)
+	ANNOTATION_VERSION = 2
+
+	# Annotation stages, in dependency order, and the slot each is stored in
+	STAGES = ('tokenized', 'pos_tagged', 'lemmatized', 'aspects')
+	STAGE_SLOTS = {'tokenized': 'token_ids',
+				   'pos_tagged': 'tag_ids',
+				   'lemmatized': 'lemma_ids',
+				   'aspects': 'span_offsets'}
 
-		Stores raw sentence in attribute and performs/stores
-		tokenization and POS tagging via class-variable tokenizer/tagger. 
+	def __init__(self, raw, review=None, stages=STAGES):
+		"""
+		INPUT: string (raw text of sentence), (optional) Review object, 
+			   (optional) list of annotation stages to compute now
+		
+		Stores raw sentence in attribute and performs/stores the given
+		annotation stages (by default, all of them: tokenization, POS tagging, 
+		lemmatization and aspect extraction) via class-variable transformers,
+		or reads them from the annotation cache, if one is in use. Any other
+		stage is computed if and when it is first accessed.
 		"""
 		
 		self.raw = raw #string
-		self.tokenized = self.word_tokenize(raw) #list of strings
-		self.pos_tagged = self.pos_tag(self.tokenized) #list of tuples
-		self.lemmatized = self.lemmatize(self.pos_tagged) #list of tuples
+
+		self.load_annotations()
+		self.annotate(stages)
 
 		if review: #if passed, store a reference to the review this came from
 			self.review = review
@@ -46,8 +100,282 @@ class Sentence(object):
 		# compute and store features for this sentence
 		#self.features = self.compute_features()
 
-		# compute and store aspects for this sentence
-		self.aspects = self.compute_aspects()
+	@classmethod
+	def use_annotation_cache(cls, path):
+		"""
+		INPUT: string (path to cache database file, or None to disable)
+		OUTPUT: None
+
+		Have all Sentences read their annotations through an 
+		on-disk AnnotationCache at path.
+		"""
+		cls.ANNOTATION_CACHE = AnnotationCache(path, cls.pipeline_version()) if path else None
+
+	@classmethod
+	def warm_up(cls):
+		"""
+		INPUT: Sentence class
+		OUTPUT: dict mapping resource name to seconds taken to load it
+
+		Load every registered resource (models, lexicons, NLTK data) now, and 
+		run one throwaway sentence through the pipeline so that WordNet (which 
+		NLTK loads lazily) is loaded too. 
+		"""
+
+		load_times = preload()
+		cls("The food was great.")
+
+		if cls.ANNOTATION_CACHE is not None:
+			cls.ANNOTATION_CACHE.commit() # write now, e.g. rather than in a process forked from this one
+
+		return load_times
+
+	@classmethod
+	def use_lemma_table(cls, path, cache_size=None):
+		"""
+		INPUT: string (path to precompiled lemma table, or None), (optional) int
+		OUTPUT: None
+
+		Load a lemma table written by CachedLemmatizer.save_table into the
+		Sentence lemmatizer, and optionally resize its LRU cache.
+		"""
+
+		if path:
+			cls.LEMMATIZER.load_table(path)
+
+		if cache_size is not None:
+			cls.LEMMATIZER.cache_size = cache_size
+
+	@classmethod
+	def pipeline_version(cls):
+		"""
+		INPUT: Sentence class
+		OUTPUT: string
+
+		Version stamp of everything that determines a Sentence's annotations:
+		the tokenizer, the tagger, the chunk grammar and aspect filters. 
+		"""
+
+		components = [cls.ANNOTATION_VERSION,
+					  nltk.__version__,
+					  getattr(nltk.tag, '_POS_TAGGER', None),
+					  word_re.pattern,
+					  cls.WORD_TOKENIZER.preserve_case,
+					  SentenceAspectExtractor.GRAMMAR,
+					  sorted(SentenceAspectExtractor.STOPWORDS),
+					  SentenceAspectExtractor.PUNCT_RE.pattern,
+					  sorted(SentenceAspectExtractor.FORBIDDEN)]
+
+		return hashlib.sha1("\n".join([repr(c) for c in components])).hexdigest()
+
+	def has_stage(self, stage):
+		"""
+		INPUT: Sentence, string (annotation stage)
+		OUTPUT: boolean
+
+		Whether the given annotation stage has been computed (or loaded) yet.
+		"""
+		return hasattr(self, Sentence.STAGE_SLOTS[stage])
+
+	def annotate(self, stages):
+		"""
+		INPUT: Sentence, list of strings (annotation stages)
+		OUTPUT: None
+
+		Compute any of the given annotation stages that haven't been 
+		computed yet, and store the result in the annotation cache. 
+		"""
+
+		missing = [stage for stage in stages if not self.has_stage(stage)]
+
+		if missing:
+			for stage in missing:
+				getattr(self, stage) # computes the stage (and those it depends on)
+			self.save_annotations()
+
+	def load_annotations(self):
+		"""
+		INPUT: Sentence
+		OUTPUT: boolean
+
+		Load whichever of this sentence's annotations are in the annotation cache. 
+		Returns False if there is no cache or the sentence isn't in it. 
+		"""
+
+		if Sentence.ANNOTATION_CACHE is None:
+			return False
+
+		annotations = Sentence.ANNOTATION_CACHE.get(self.raw)
+
+		if annotations is None:
+			return False
+
+		self.token_ids = Sentence.TOKENS.encode(annotations['tokenized'])
+
+		if 'tags' in annotations:
+			self.tag_ids = Sentence.TAGS.encode(annotations['tags'])
+		if 'lemmas' in annotations:
+			self.lemma_ids = Sentence.TOKENS.encode(annotations['lemmas'])
+		if 'aspect_spans' in annotations:
+			self.aspect_spans = annotations['aspect_spans']
+
+		return True
+
+	def save_annotations(self):
+		"""
+		INPUT: Sentence
+		OUTPUT: None
+
+		Store whichever of this sentence's annotations have been computed 
+		in the annotation cache, if there is one. 
+		"""
+
+		if Sentence.ANNOTATION_CACHE is None or not self.has_stage('tokenized'):
+			return
+
+		annotations = {'tokenized': Sentence.TOKENS.decode(self.token_ids)}
+
+		if self.has_stage('pos_tagged'):
+			annotations['tags'] = Sentence.TAGS.decode(self.tag_ids)
+		if self.has_stage('lemmatized'):
+			annotations['lemmas'] = Sentence.TOKENS.decode(self.lemma_ids)
+		if self.has_stage('aspects'):
+			annotations['aspect_spans'] = self.aspect_spans
+
+		Sentence.ANNOTATION_CACHE.put(self.raw, annotations)
+
+	## (LAZY) VIEWS OF THE COMPACT REPRESENTATION ##
+
+	@property
+	def tokenized(self):
+		"""
+		List of strings (words in sentence)
+		"""
+		if not self.has_stage('tokenized'):
+			self.tokenized = self.word_tokenize(self.raw)
+
+		return Sentence.TOKENS.decode(self.token_ids)
+
+	@tokenized.setter
+	def tokenized(self, tokens):
+		self.token_ids = Sentence.TOKENS.encode(tokens)
+
+	@property
+	def n_tokens(self):
+		"""
+		Number of words in sentence (without building the list of words)
+		"""
+		if not self.has_stage('tokenized'):
+			self.tokenized = self.word_tokenize(self.raw)
+
+		return len(self.token_ids)
+
+	@property
+	def pos_tagged(self):
+		"""
+		List of tuples of form (token, POS)
+		"""
+		if not self.has_stage('pos_tagged'):
+			self.pos_tagged = self.pos_tag(self.tokenized)
+
+		return zip(self.tokenized, Sentence.TAGS.decode(self.tag_ids))
+
+	@pos_tagged.setter
+	def pos_tagged(self, pos_tagged_sent):
+		self.token_ids = Sentence.TOKENS.encode([wrd for wrd, _ in pos_tagged_sent])
+		self.tag_ids = Sentence.TAGS.encode([pos for _, pos in pos_tagged_sent])
+
+	@property
+	def lemmatized(self):
+		"""
+		List of tuples of form (lemma, POS)
+		"""
+		if not self.has_stage('lemmatized'):
+			self.lemmatized = self.lemmatize(self.pos_tagged)
+
+		return zip(Sentence.TOKENS.decode(self.lemma_ids), Sentence.TAGS.decode(self.tag_ids))
+
+	@lemmatized.setter
+	def lemmatized(self, lemmatized_sent):
+		self.lemma_ids = Sentence.TOKENS.encode([lemma for lemma, _ in lemmatized_sent])
+
+	@property
+	def aspect_spans(self):
+		"""
+		List of (start, end) tuples (token offsets of the candidate aspects)
+		"""
+		if not self.has_stage('aspects'):
+			self.aspect_spans = self.compute_aspect_spans()
+
+		offsets = self.span_offsets
+		return [(offsets[i], offsets[i+1]) for i in xrange(0, len(offsets), 2)]
+
+	@aspect_spans.setter
+	def aspect_spans(self, spans):
+		self.span_offsets = array('i', [offset for span in spans for offset in span])
+
+	@property
+	def aspects(self):
+		"""
+		List of lists of strings (candidate aspects in sentence)
+		"""
+		tokens = self.tokenized
+		return [tokens[start:end] for start, end in self.aspect_spans]
+
+	@property
+	def review(self):
+		"""
+		The Review this sentence came from (or None)
+		"""
+		return self._review() if getattr(self, '_review', None) else None
+
+	@review.setter
+	def review(self, review):
+		self._review = weakref.ref(review)
+
+	@classmethod
+	def from_analysis(cls, analysis, review=None):
+		"""
+		INPUT: dict (stored analysis of a sentence, see encode_analysis), (optional) Review
+		OUTPUT: Sentence
+
+		Rebuilds a previously-analyzed Sentence without re-running tokenization,
+		tagging, lemmatization or aspect extraction. Only the stages needed
+		to summarize the sentence are restored (its model scores, if any, are
+		loaded into the Business' score cache); others are computed on access.
+		"""
+
+		sent = cls.__new__(cls)
+
+		sent.raw = analysis['raw']
+		sent.tokenized = analysis['tokenized']
+		sent.aspect_spans = analysis['aspect_spans']
+
+		if review:
+			sent.review = review
+			sent.stars = review.stars
+
+		return sent
+
+	def encode_analysis(self, scores=None):
+		"""
+		INPUT: Sentence, (optional) dict with keys 'prob_opin' and 'prob_pos'
+		OUTPUT: dict
+
+		Encodes the results of this sentence's analysis (and model scores,
+		if given) for storage. 
+		"""
+
+		analysis = {'raw': self.raw,
+					'tokenized': self.tokenized,
+					'aspect_spans': [list(span) for span in self.aspect_spans]
+					}
+
+		if scores:
+			analysis['prob_opin'] = scores['prob_opin']
+			analysis['prob_pos'] = scores['prob_pos']
+
+		return analysis
 
 	def word_tokenize(self, raw):
 		"""
@@ -70,7 +398,40 @@ class Sentence(object):
 		the standard NLTK POS tagger. 
 		"""
 
-		return nltk.pos_tag(tokenized_sent)
+		return Sentence.get_tagger().tag(tokenized_sent)
+
+	@classmethod
+	def get_tagger(cls):
+		"""
+		INPUT: Sentence class
+		OUTPUT: NLTK tagger
+
+		Returns the one instance of the standard NLTK POS 
+		tagger (i.e. the one used by nltk.pos_tag), loading it if needed.
+		"""
+		return cls.TAGGER
+
+	@classmethod
+	def batch_pos_tag(cls, sents):
+		"""
+		INPUT: Sentence class, list of Sentence objects
+		OUTPUT: None
+
+		POS tag all of the given sentences that aren't tagged yet 
+		with a single call to the tagger, and hand each sentence its tags. 
+		"""
+
+		untagged = [sent for sent in sents if not sent.has_stage('pos_tagged')]
+		tokenized_sents = [sent.tokenized for sent in untagged]
+
+		tagger = cls.get_tagger()
+		if hasattr(tagger, 'tag_sents'):
+			tagged_sents = tagger.tag_sents(tokenized_sents)
+		else:
+			tagged_sents = tagger.batch_tag(tokenized_sents) # NLTK 2.x name
+
+		for sent, pos_tagged_sent in zip(untagged, tagged_sents):
+			sent.pos_tagged = pos_tagged_sent
 
 	def lemmatize(self, pos_tagged_sent):
 		"""
@@ -80,16 +441,9 @@ class Sentence(object):
 		Given a POS tagged sentence, use wordnet to lemmatize it. 
 		"""
 
-		lemmatized_sent = []
-
-		# Logic to use POS tag if possible
-		for wrd, pos in pos_tagged_sent:
-			try: 
-				lemmatized_sent.append((Sentence.LEMMATIZER.lemmatize(wrd, pos), pos))
-			except KeyError:
-				lemmatized_sent.append((Sentence.LEMMATIZER.lemmatize(wrd), pos))
+		lemmatize = Sentence.LEMMATIZER.lemmatize # uses the POS tag if WordNet knows it
 
-		return lemmatized_sent
+		return [(lemmatize(wrd, pos), pos) for wrd, pos in pos_tagged_sent]
 
 	def get_features(self, asarray = False):
 		"""
@@ -109,14 +463,25 @@ class Sentence(object):
 		else:
 			return np.array([val for _, val in self.features.iteritems()])
 
-	def compute_aspects(self):
+	@classmethod
+	def feature_matrix(cls, sents):
+		"""
+		INPUT: Sentence class, list of Sentence objects
+		OUTPUT: 2d np array (one row per sentence, columns as in FEATURIZER.feature_names)
+
+		Featurizes the sentences in one batch; row i equals 
+		sents[i].get_features(asarray=True). 
+		"""
+		return cls.FEATURIZER.featurize_batch(sents)
+
+	def compute_aspect_spans(self):
 		"""
 		INPUT: Sentence
-		OUTPUT: list of lists of strings (i.e. list of aspects)
+		OUTPUT: list of (start, end) tuples (i.e. token spans of aspects)
 
 		Get the candidate aspects contained in this sentence. 
 		"""
-		return Sentence.ASP_EXTRACTOR.get_sent_aspects(self)
+		return Sentence.ASP_EXTRACTOR.get_sent_aspect_spans(self)
 
 	def has_aspect(self, asp_string):
 		"""
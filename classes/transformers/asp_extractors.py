@@ -1,6 +1,7 @@
 import nltk
 import re
 from nltk.corpus import stopwords
+from resources import Resource, register
 
 class SentenceAspectExtractor():
 
@@ -14,17 +15,26 @@ class SentenceAspectExtractor():
         {<NBAR>}
     """    
 
+    # Chunker for GRAMMAR (chunk_NP_spans matches it directly; this is kept to check against)
     CHUNKER = nltk.RegexpParser(GRAMMAR)
 
+    # Tags that join two NBARs into one NP in GRAMMAR
+    NP_LINK_TAGS = frozenset(['IN', 'CC'])
+
+    # Max number of tag sequences whose NP spans are memoized
+    MAX_CACHED_TAG_SEQUENCES = 100000
+
     _my_stopword_additions = ["it's", "i'm", "star", "", "time", "night", "try", "sure", "times", "way", "friends"]
-    STOPWORDS = set(stopwords.words('english') + _my_stopword_additions)
+    STOPWORDS = Resource('aspect_stopwords') # loaded on first use
 
     PUNCT_RE = re.compile("^[\".:;!?')(/]$")
+    PUNCT = frozenset("\".:;!?')(/") # the tokens PUNCT_RE matches
     
     FORBIDDEN = {'great', 'good', 'time', 'friend', 'way', 'friends'}
 
     def __init__(self):
-        pass
+        self.np_spans_cache = {} # tuple of POS tags -> NP spans
+        self.non_aspect_words = None # stopwords and punctuation (built on first use)
 
     def get_sent_aspects(self, sentence):
         """
@@ -34,27 +44,108 @@ class SentenceAspectExtractor():
         Given a sentence, return the aspects
         """
 
+        words = [w for w,t in sentence.pos_tagged]
+        return [words[start:end] for start, end in self.get_sent_aspect_spans(sentence)]
+
+    def get_sent_aspect_spans(self, sentence):
+        """
+        INPUT: Sentence
+        OUTPUT: list of (start, end) tuples (token offsets)
+
+        Given a sentence, return the token spans of its aspects
+        """
+
         tagged_sent = sentence.pos_tagged
-        tree = SentenceAspectExtractor.CHUNKER.parse(tagged_sent)
-        aspects = self.get_NPs(tree)
+        words = [w for w,t in tagged_sent]
+        spans = self.chunk_NP_spans(tuple([t for w,t in tagged_sent]))
 
         # filter invalid aspects
-        return [asp for asp in aspects if self.valid_aspect(asp)]
+        return [(start, end) for start, end in spans if self.valid_aspect(words[start:end])]
+
+    def get_sent_aspect_spans_regexp(self, sentence):
+        """
+        INPUT: Sentence
+        OUTPUT: list of (start, end) tuples (token offsets)
 
-    def get_NPs(self, tree):
+        Same as get_sent_aspect_spans, but chunks with nltk's 
+        RegexpParser (slower; kept to verify chunk_NP_spans against)
         """
-        Given a chunk tree, return the noun phrases
+
+        tagged_sent = sentence.pos_tagged
+        tree = SentenceAspectExtractor.CHUNKER.parse(tagged_sent)
+        words = [w for w,t in tagged_sent]
+
+        return [(start, end) for start, end in self.get_NP_spans(tree) if self.valid_aspect(words[start:end])]
+
+    def chunk_NP_spans(self, tags):
         """
+        INPUT: tuple of strings (POS tags of a sentence)
+        OUTPUT: list of (start, end) tuples (token offsets)
 
-        return [[w for w,t in leaf] for leaf in self.leaves(tree)]
+        Return the spans of the NPs that GRAMMAR chunks, in order, matching
+        the grammar directly over the tags. Memoized by tag sequence. 
+        """
 
-    def leaves(self, tree):
+        try:
+            return self.np_spans_cache[tags]
+        except KeyError:
+            pass
+
+        # NBAR: a run of <NN.*|JJ> tags, up to and including its last <NN.*>
+        nbars = []
+        start = last_noun = None
+
+        for i, tag in enumerate(tags + (None,)):
+            if tag is not None and tag.startswith('NN'): # <NN.*>
+                if start is None:
+                    start = i
+                last_noun = i
+            elif tag == 'JJ':
+                if start is None:
+                    start = i
+            else:
+                if last_noun is not None:
+                    nbars.append((start, last_noun + 1))
+                start = last_noun = None
+
+        # NP: <NBAR><IN|CC><NBAR> (leftmost first), else a lone <NBAR>
+        spans = []
+        i = 0
+
+        while i < len(nbars):
+            if i + 1 < len(nbars) and nbars[i+1][0] == nbars[i][1] + 1 and tags[nbars[i][1]] in self.NP_LINK_TAGS:
+                spans.append((nbars[i][0], nbars[i+1][1]))
+                i += 2
+            else:
+                spans.append(nbars[i])
+                i += 1
+
+        if len(self.np_spans_cache) >= self.MAX_CACHED_TAG_SEQUENCES:
+            self.np_spans_cache.clear()
+        self.np_spans_cache[tags] = spans
+
+        return spans
+
+    def get_NP_spans(self, tree, offset=0):
         """
-        Generator of NP (nounphrase) leaf nodes of a chunk tree.
+        Given a chunk tree, return the (start, end) token 
+        offsets of the noun phrases, in order
         """
 
-        for subtree in tree.subtrees(filter=lambda t: t.node=='NP'):
-            yield subtree.leaves()
+        spans = []
+
+        for child in tree:
+            if isinstance(child, nltk.Tree):
+                n_leaves = len(child.leaves())
+                if child.node == 'NP':
+                    spans.append((offset, offset + n_leaves))
+                else:
+                    spans.extend(self.get_NP_spans(child, offset))
+                offset += n_leaves
+            else:
+                offset += 1
+
+        return spans
 
     def valid_aspect(self, aspect):
         """
@@ -62,13 +153,16 @@ class SentenceAspectExtractor():
         OUTPUT: boolean
         """
 
-        no_stops = [w for w in aspect if w not in SentenceAspectExtractor.STOPWORDS and not self.PUNCT_RE.match(w)]
+        if self.non_aspect_words is None:
+            self.non_aspect_words = frozenset(SentenceAspectExtractor.STOPWORDS) | self.PUNCT
 
-        if len(no_stops) < 1: #
+        non_aspect_words = self.non_aspect_words
+
+        if all([w in non_aspect_words for w in aspect]): # only stopwords/punctuation
             return False
-        elif any([forbid_wrd in aspect for forbid_wrd in SentenceAspectExtractor.FORBIDDEN]):
+        elif any([w in SentenceAspectExtractor.FORBIDDEN for w in aspect]):
             return False
         else:
             return True
 
-
+register('aspect_stopwords', lambda: set(stopwords.words('english') + SentenceAspectExtractor._my_stopword_additions))
@@ -1,9 +1,48 @@
 from __future__ import division
+import os
+import numpy as np
+import cPickle as pickle
+import resources
 from tokenizers import NegationSuffixAdder
 from collections import OrderedDict
 
+# Bump whenever the way the lexicons are parsed changes (invalidates compiled lexicons)
+LEXICON_FORMAT = 1
+
+def load_compiled_lexicon(compiled_path, source_paths, build):
+	"""
+	INPUT: string (path to compiled lexicon), list of strings (paths to 
+		   the raw lexicon files), function (parses the raw files)
+	OUTPUT: the parsed lexicon
+
+	Loads the lexicon from its compiled (pickled) form if that is newer 
+	than the raw files and of the current LEXICON_FORMAT. Otherwise parses 
+	the raw files with build and (re)writes the compiled form, if possible. 
+	"""
+
+	if os.path.exists(compiled_path) and os.path.getmtime(compiled_path) >= max([os.path.getmtime(path) for path in source_paths]):
+		with open(compiled_path, 'rb') as f:
+			lexicon_format, lexicon = pickle.load(f)
+		if lexicon_format == LEXICON_FORMAT:
+			return lexicon
+
+	lexicon = build()
+
+	try:
+		tmp_path = "%s.%d.tmp" % (compiled_path, os.getpid()) # write-then-rename, so concurrent readers never see a partial file
+		with open(tmp_path, 'wb') as f:
+			pickle.dump((LEXICON_FORMAT, lexicon), f, pickle.HIGHEST_PROTOCOL)
+		os.rename(tmp_path, compiled_path)
+	except (IOError, OSError):
+		pass # e.g. read-only lexicon directory; just parse the raw files every time
+
+	return lexicon
+
 class BaseFeaturizer(object):
 
+	# Names of the features in the dict returned by featurize
+	FEATURE_NAMES = ()
+
 	def __init__(self):
 		pass
 
@@ -13,6 +52,16 @@ class BaseFeaturizer(object):
 		"""
 		pass
 
+	def featurize_columns(self, sents):
+		"""
+		INPUT: BaseFeaturizer, list of Sentences
+		OUTPUT: dict mapping feature name to list of values (one per sentence)
+		"""
+
+		rows = [self.featurize(sent) for sent in sents]
+
+		return dict([(name, [row[name] for row in rows]) for name in self.FEATURE_NAMES])
+
 class MetaFeaturizer(BaseFeaturizer):
 
 	def __init__(self, featurizer_list):
@@ -24,6 +73,15 @@ class MetaFeaturizer(BaseFeaturizer):
 
 		self.featurizer_list = featurizer_list
 
+		# Column schema of featurize_batch: all feature names in sorted order, 
+		# i.e. the key order of featurize. Training data is written with these columns. 
+		names = set(['review_stars'])
+		for featurizer in featurizer_list:
+			names.update(featurizer.FEATURE_NAMES)
+
+		self.feature_names = tuple(sorted(names))
+		self.column_index = dict([(name, i) for i, name in enumerate(self.feature_names)])
+
 	def featurize(self, sent):
 		"""
 		INPUT: MetaFeaturizer, Sentence
@@ -43,9 +101,26 @@ class MetaFeaturizer(BaseFeaturizer):
 
 		return OrderedDict(sorted(features.items())) # need to preserve order. 
 
+	def featurize_batch(self, sents):
+		"""
+		INPUT: MetaFeaturizer, list of Sentences
+		OUTPUT: 2d np array (one row per sentence, columns as in self.feature_names)
+
+		Batch version of featurize: fills a feature matrix one
+		column at a time, rather than building a dict per sentence. 
+		"""
+
+		X = np.empty((len(sents), len(self.feature_names)))
+
+		for featurizer in self.featurizer_list:
+			for name, values in featurizer.featurize_columns(sents).iteritems():
+				X[:, self.column_index[name]] = values
+
+		X[:, self.column_index['review_stars']] = [sent.stars for sent in sents]
+
+		return X
+
 class SubjFeaturizer(BaseFeaturizer):
-	
-	PATH_TO_LEXICON = '/Users/jeff/Projects/yelp_opinion_mining/raw_data/Lexicons/subjectivity_clues_hltemnlp05/subjclueslen1-HLTEMNLP05.tff'
 
 	TAG_MAP = {'NN': 'noun',
 			   'NNS': 'noun',
@@ -63,22 +138,26 @@ class SubjFeaturizer(BaseFeaturizer):
 			   'VBP': 'verb',
 			   'VBZ': 'verb'}
 
-	def __init__(self):
+	FEATURE_NAMES = ('frac_strongsubj', 'frac_weaksubj', 'total_subj')
 
-		self.lex_dict = self.read_lexicon(SubjFeaturizer.PATH_TO_LEXICON)
+	def __init__(self, path=None):
+		"""
+		INPUT: SubjFeaturizer, (optional) string (path to lexicon; default: the 'subj_lexicon' resource path)
+		"""
+
+		path = path or resources.path('subj_lexicon')
+		self.lex_dict = load_compiled_lexicon(path + '.p', [path], lambda: self.read_lexicon(path))
 
 	def read_lexicon(self, path):
 		"""
 		Read the lexicon from file
 		"""
 
-		with open(path, 'r') as f: 
-			parsed = [self.parse_line(line) for line in f.readlines()]
-
 		lex_dict = {}
 
-		for wrd in parsed: 
-			lex_dict = dict(lex_dict.items() + wrd.items())
+		with open(path, 'r') as f: 
+			for line in f:
+				lex_dict.update(self.parse_line(line)) # later lines win
 
 		return lex_dict
 
@@ -187,19 +266,24 @@ class LiuFeaturizer(BaseFeaturizer):
     Download lexicon at: http://www.cs.uic.edu/~liub/FBS/opinion-lexicon-English.rar
 	"""
 
-	PATH_TO_LEXICONS = '/Users/jeff/Projects/yelp_opinion_mining/raw_data/Lexicons'
 	NEG_SUFFIXER = NegationSuffixAdder()
 
-	def __init__(self):
+	FEATURE_NAMES = ('raw', 'frac_pos', 'frac_neg', # lexical features
+					 'n_nouns', 'n_adjs', 'n_advbs', 'frac_nouns', 'frac_adjs', 'frac_advbs', # POS features
+					 'has_pronoun', 'has_cardinal', 'has_modal')
+
+	def __init__(self, lexicons_dir=None):
 		"""
-		Read in the lexicons. 
+		Read in the lexicons (from lexicons_dir; default: the 'liu_lexicons' resource path). 
 		"""
 
-		pos_path = self.PATH_TO_LEXICONS + "/Liu/positive-words.txt"
-		neg_path = self.PATH_TO_LEXICONS + "/Liu/negative-words.txt"
+		lexicons_dir = lexicons_dir or resources.path('liu_lexicons')
 
-		self.pos_lex = self.read_lexicon(pos_path)
-		self.neg_lex = self.read_lexicon(neg_path)
+		pos_path = lexicons_dir + "/Liu/positive-words.txt"
+		neg_path = lexicons_dir + "/Liu/negative-words.txt"
+
+		build = lambda: (self.read_lexicon(pos_path), self.read_lexicon(neg_path))
+		self.pos_lex, self.neg_lex = load_compiled_lexicon(lexicons_dir + "/Liu/opinion-lexicon.p", [pos_path, neg_path], build)
 
 	def read_lexicon(self, path):
 		'''
@@ -333,5 +417,154 @@ class LiuFeaturizer(BaseFeaturizer):
 
 		return features
 
+class LexiconFeaturizer(BaseFeaturizer):
+	"""
+	Class computing all of the features of a SubjFeaturizer and a LiuFeaturizer 
+	(lexicon and POS-count features) in a single pass over a sentence. 
+
+	Each distinct token, (lemma, POS) pair and POS tag is looked up in the 
+	lexicons once, and its contribution to the features is kept in a table. 
+	Negation marking is tracked inline, as NegationSuffixAdder would mark 
+	the tokens, rather than by building "_NEG"-suffixed strings. The features
+	are identical to those of the two featurizers (quirks included). 
+	"""
+
+	# POS tag classes counted by LiuFeaturizer.get_pos_feats
+	NOUN, ADJ, ADVB, PRONOUN = range(4)
+	TAG_CLASSES = {'NN': NOUN, 'NNS': NOUN, 'NNP': NOUN, 'NNPS': NOUN,
+				   'JJ': ADJ, 'JJR': ADJ, 'JJS': ADJ,
+				   'RB': ADVB, 'RBR': ADVB, 'RBS': ADVB,
+				   'PRP': PRONOUN, 'PRP$': PRONOUN}
+
+	FEATURE_NAMES = SubjFeaturizer.FEATURE_NAMES + LiuFeaturizer.FEATURE_NAMES
+
+	def __init__(self, subj_featurizer, liu_featurizer):
+		"""
+		INPUT: LexiconFeaturizer, SubjFeaturizer, LiuFeaturizer (whose lexicons are used)
+		"""
+
+		self.subj = subj_featurizer
+		self.liu = liu_featurizer
+
+		self.token_table = {} # token -> (is clause punctuation, is negation, polarity, polarity if negated)
+		self.lemma_table = {} # (lemma, POS) -> subjectivity type, or None
+
+	def token_entry(self, tok):
+		"""
+		INPUT: LexiconFeaturizer, string (token)
+		OUTPUT: tuple (is clause punctuation, is negation, polarity, polarity if negated)
+
+		Polarities are +1/-1/0, for a token counted as positive/negative/neither 
+		by LiuFeaturizer.get_lex_feats outside and inside a negation block. 
+		"""
+
+		try:
+			return self.token_table[tok]
+		except KeyError:
+			pass
+
+		pos_lex, neg_lex = self.liu.pos_lex, self.liu.neg_lex
+
+		def flipped(tok): # as get_lex_feats counts a token ending in "_NEG"
+			key = tok.strip("_NEG")
+			return -1 if key in pos_lex else (1 if key in neg_lex else 0)
+
+		if tok.endswith("_NEG"):
+			polarity = flipped(tok)
+		else:
+			polarity = 1 if tok in pos_lex else (-1 if tok in neg_lex else 0)
+
+		suffixer = LiuFeaturizer.NEG_SUFFIXER
+		entry = (bool(suffixer.PUNCT_RE.match(tok)), bool(suffixer.NEGATION_RE.match(tok)), polarity, flipped(tok + "_NEG"))
+
+		self.token_table[tok] = entry
+		return entry
+
+	def lemma_entry(self, lemma, pos):
+		"""
+		INPUT: LexiconFeaturizer, string (lemma), string (POS tag)
+		OUTPUT: string (subjectivity type), or None if not in the lexicon
+		"""
+
+		key = (lemma, pos)
+
+		try:
+			return self.lemma_table[key]
+		except KeyError:
+			info = self.subj.get_from_lexicon(lemma, pos)
+			self.lemma_table[key] = info['type'] if info else None
+			return self.lemma_table[key]
+
+	def score(self, sent):
+		"""
+		INPUT: LexiconFeaturizer, Sentence
+		OUTPUT: tuple of feature values, in the order of FEATURE_NAMES
+		"""
+
+		tokens = sent.tokenized
+		pos_tagged = sent.pos_tagged
+		lemmatized = sent.lemmatized
+
+		n_wrds = len(tokens)
+		assert n_wrds > 0, "Can't featurize sentence with no tokens"
+
+		n_strongsubj = n_weaksubj = 0
+		num_pos = num_neg = 0
+		counts = [0, 0, 0, 0] # by tag class
+		has_modal = 0
+		negated = False
+
+		tag_classes = LexiconFeaturizer.TAG_CLASSES
+
+		for tok, (wrd, tag), (lemma, _) in zip(tokens, pos_tagged, lemmatized):
+
+			is_punct, is_negation, polarity, negated_polarity = self.token_entry(tok)
+
+			if is_punct:
+				negated = False
+
+			polarity = negated_polarity if negated else polarity
+			if polarity == 1:
+				num_pos += 1
+			elif polarity == -1:
+				num_neg += 1
+
+			if is_negation:
+				negated = True
+
+			subj_type = self.lemma_entry(lemma, tag)
+			if subj_type == 'strongsubj':
+				n_strongsubj += 1
+			elif subj_type == 'weaksubj':
+				n_weaksubj += 1
+
+			if tag in tag_classes:
+				counts[tag_classes[tag]] += 1
+			elif tag == 'MD' and wrd != 'will':
+				has_modal = 1
+
+		n_nouns, n_adjs, n_advbs, n_pronouns = counts
+		has_pronoun = 1 if n_pronouns else 0
+
+		return (n_strongsubj / n_wrds, n_weaksubj / n_wrds, n_strongsubj + n_weaksubj, # SubjFeaturizer
+				num_pos - num_neg, num_pos / n_wrds, num_neg / n_wrds, # LiuFeaturizer (lexical)
+				n_nouns, n_adjs, n_advbs, n_nouns / n_wrds, n_adjs / n_wrds, n_advbs / n_wrds, # LiuFeaturizer (POS)
+				has_pronoun, has_pronoun, has_modal) # has_cardinal is computed from pronouns, as in LiuFeaturizer
+
+	def featurize(self, sent):
+		"""
+		INPUT: LexiconFeaturizer, Sentence
+		OUTPUT: dict
+		"""
+		return dict(zip(self.FEATURE_NAMES, self.score(sent)))
+
+	def featurize_columns(self, sents):
+		"""
+		INPUT: LexiconFeaturizer, list of Sentences
+		OUTPUT: dict mapping feature name to list of values (one per sentence)
+		"""
 
+		if not sents:
+			return dict([(name, []) for name in self.FEATURE_NAMES])
 
+		return dict(zip(self.FEATURE_NAMES, zip(*[self.score(sent) for sent in sents])))
@@ -0,0 +1,98 @@
+import cPickle as pickle
+
+from collections import OrderedDict
+from nltk.stem.wordnet import WordNetLemmatizer
+
+class CachedLemmatizer(object):
+	"""
+	Class to lemmatize (word, POS) pairs with WordNet, memoizing the results.
+
+	POS tags that WordNet doesn't know (e.g. the Penn Treebank tags output by
+	the NLTK tagger) are mapped to WordNet's default, noun, exactly as
+	WordNetLemmatizer does when falling back. Lemmas are looked up first in
+	an optional precompiled table (see compile_table/load_table), then in a
+	bounded LRU cache holding up to cache_size pairs.
+	"""
+
+	# POS tags that WordNet's morphy accepts; everything else is lemmatized as a noun
+	WORDNET_POS = frozenset(['n', 'v', 'a', 'r'])
+
+	def __init__(self, cache_size=100000):
+		"""
+		INPUT: CachedLemmatizer, int (max number of (word, POS) pairs in the LRU cache)
+		"""
+
+		self.lemmatizer = WordNetLemmatizer()
+		self.cache_size = cache_size
+
+		self.table = {} # precompiled (word, POS) -> lemma
+		self.cache = OrderedDict() # (word, POS) -> lemma, least recently used first
+
+	def wordnet_pos(self, pos):
+		"""
+		INPUT: CachedLemmatizer, string (POS tag)
+		OUTPUT: string (WordNet POS)
+		"""
+		return pos if pos in CachedLemmatizer.WORDNET_POS else 'n'
+
+	def lemmatize(self, wrd, pos):
+		"""
+		INPUT: CachedLemmatizer, string (word), string (POS tag)
+		OUTPUT: string (lemma)
+		"""
+
+		key = (wrd, self.wordnet_pos(pos))
+
+		try:
+			return self.table[key]
+		except KeyError:
+			pass
+
+		try:
+			lemma = self.cache.pop(key) # re-inserted below as most recently used
+		except KeyError:
+			lemma = self.lemmatizer.lemmatize(*key)
+			if len(self.cache) >= self.cache_size:
+				self.cache.popitem(last=False)
+
+		self.cache[key] = lemma
+		return lemma
+
+	def compile_table(self, words, pos='n'):
+		"""
+		INPUT: CachedLemmatizer, iterable of strings (vocabulary), (optional) string (POS tag)
+		OUTPUT: None
+
+		Lemmatize every word in the vocabulary (with the given POS) into
+		the precompiled table. The default, noun, is the POS that every
+		tag output by the NLTK tagger maps to.
+		"""
+
+		pos = self.wordnet_pos(pos)
+
+		for wrd in words:
+			key = (wrd, pos)
+			if key not in self.table:
+				self.table[key] = self.lemmatizer.lemmatize(*key)
+
+	def save_table(self, path):
+		"""
+		INPUT: CachedLemmatizer, string (path)
+		OUTPUT: None
+		"""
+		with open(path, 'wb') as f:
+			pickle.dump(self.table, f, pickle.HIGHEST_PROTOCOL)
+
+	def load_table(self, path):
+		"""
+		INPUT: CachedLemmatizer, string (path)
+		OUTPUT: None
+
+		Load a table written by save_table. Loading it at start-up keeps
+		WordNet (which is loaded lazily) off the hot path for the corpus vocabulary.
+		"""
+		with open(path, 'rb') as f:
+			self.table = pickle.load(f)
+
+	def __len__(self):
+		return len(self.table) + len(self.cache)
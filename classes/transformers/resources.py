@@ -0,0 +1,139 @@
+"""
+resources.py
+
+Registry of the expensive resources used by the pipeline (pickled models,
+lexicons, NLTK data). Each is loaded the first time it is used, rather than
+when its module is imported, from a path that can be changed with configure.
+
+A class exposes a resource as a class attribute with the Resource descriptor,
+e.g. SENTIMENT_MODEL = Resource('sentiment_model'); its loader is registered
+(with register) by the module that defines the class. Use preload to load
+everything up front, e.g. before forking worker processes.
+"""
+
+import os
+import time
+import hashlib
+
+# Default locations of the resources' files (see configure)
+PATHS = {'sentiment_model': '/Users/jeff/Projects/yelp_opinion_mining/modeling/results/final_models/senti_pred.p',
+		 'opinion_model': '/Users/jeff/Projects/yelp_opinion_mining/modeling/results/final_models/opin_pred.p',
+		 'subj_lexicon': '/Users/jeff/Projects/yelp_opinion_mining/raw_data/Lexicons/subjectivity_clues_hltemnlp05/subjclueslen1-HLTEMNLP05.tff',
+		 'liu_lexicons': '/Users/jeff/Projects/yelp_opinion_mining/raw_data/Lexicons',
+		 'sent_tokenizer': 'tokenizers/punkt/english.pickle'} # NLTK data path
+
+LOADERS = {} # name -> (function loading the resource, paths it depends on)
+LOADED = {} # name -> loaded resource
+LOAD_TIMES = {} # name -> seconds taken to load
+
+def register(name, loader, paths=()):
+	"""
+	INPUT: string (resource name), function (no arguments; returns the resource),
+		   (optional) list of strings (names of the PATHS the loader reads)
+	OUTPUT: None
+	"""
+	LOADERS[name] = (loader, tuple(paths))
+
+def path(name):
+	"""
+	INPUT: string (name of path)
+	OUTPUT: string (currently configured path)
+	"""
+	return PATHS[name]
+
+def fingerprint(names):
+	"""
+	INPUT: list of strings (names of paths)
+	OUTPUT: string (hex digest)
+
+	Cheap fingerprint of the files at these paths (every file under
+	a directory), from their sizes and modification times. It changes
+	when a model or lexicon is replaced, or a path is configured to a 
+	different file. 
+	"""
+
+	stats = []
+
+	for name in sorted(names):
+		stats.append(name)
+
+		files = [PATHS[name]]
+		if os.path.isdir(PATHS[name]):
+			files = sorted([os.path.join(root, f) for root, _, fs in os.walk(PATHS[name]) for f in fs])
+
+		for f in files:
+			try:
+				st = os.stat(f)
+				stats.append("%s %d %r" % (f, st.st_size, st.st_mtime))
+			except OSError:
+				stats.append("%s missing" % f)
+
+	return hashlib.sha1("\n".join(stats)).hexdigest()
+
+def configure(**paths):
+	"""
+	INPUT: paths to change, by name (e.g. sentiment_model='./senti_pred.p')
+	OUTPUT: None
+
+	Change resource paths. Resources already loaded from a changed
+	path are dropped, and re-loaded from the new path on next use.
+	"""
+
+	unknown = set(paths) - set(PATHS)
+	if unknown:
+		raise KeyError("Unknown resource path(s): %s" % ", ".join(sorted(unknown)))
+
+	PATHS.update(paths)
+
+	for name, (_, deps) in LOADERS.iteritems():
+		if set(deps) & set(paths):
+			LOADED.pop(name, None)
+
+def get(name):
+	"""
+	INPUT: string (resource name)
+	OUTPUT: the resource, loading it if needed
+	"""
+
+	try:
+		return LOADED[name]
+	except KeyError:
+		pass
+
+	loader, _ = LOADERS[name]
+
+	start = time.time()
+	LOADED[name] = loader()
+	LOAD_TIMES[name] = time.time() - start
+
+	return LOADED[name]
+
+def preload(names=None):
+	"""
+	INPUT: (optional) list of resource names (default: all registered)
+	OUTPUT: dict mapping resource name to seconds taken to load it
+
+	Load resources now rather than on first use.
+	"""
+
+	names = sorted(LOADERS) if names is None else names
+
+	for name in names:
+		get(name)
+
+	return dict([(name, LOAD_TIMES.get(name, 0.0)) for name in names])
+
+class Resource(object):
+	"""
+	Descriptor for a class attribute holding a registered resource,
+	which is loaded on first access.
+	"""
+
+	def __init__(self, name):
+		"""
+		INPUT: Resource, string (resource name)
+		"""
+		self.name = name
+
+	def __get__(self, obj, cls):
+		return get(self.name)
@@ -1,15 +1,110 @@
+import os
 import pickle
+import numpy as np
 
-class SentimentModel(object): 
+from svc import CompiledSVC
+from resources import Resource, register, path
 
-	SENTIMENT_MODEL = pickle.load(open('/Users/jeff/Projects/yelp_opinion_mining/modeling/results/final_models/senti_pred.p', 'rb'))
+def load_model(name):
+	"""
+	INPUT: string (resource name of a pickled model)
+	OUTPUT: fitted sklearn classifier
+	"""
+	with open(path(name), 'rb') as f:
+		return pickle.load(f)
+
+def load_svc_model(name):
+	"""
+	INPUT: string (resource name of a pickled SVC model)
+	OUTPUT: CompiledSVC (or the unpickled model, if it can't be compiled)
+
+	Loads the model's compiled form (an .npz file next to the pickle) if it is
+	up to date; otherwise unpickles the model, compiles it and (if possible)
+	writes the compiled form for next time. 
+	"""
+
+	pickle_path = path(name)
+	compiled_path = os.path.splitext(pickle_path)[0] + '.npz'
+
+	if os.path.exists(compiled_path) and (not os.path.exists(pickle_path) or os.path.getmtime(compiled_path) >= os.path.getmtime(pickle_path)):
+		return CompiledSVC.load(compiled_path)
+
+	model = load_model(name)
+
+	try:
+		compiled = CompiledSVC.from_sklearn(model)
+	except (ValueError, AttributeError):
+		return model # not an SVC (pipeline) we can compile
+
+	try:
+		compiled.save(compiled_path)
+	except (IOError, OSError):
+		pass
+
+	return compiled
+
+register('sentiment_model', lambda: load_model('sentiment_model'), paths=['sentiment_model'])
+register('opinion_model', lambda: load_svc_model('opinion_model'), paths=['opinion_model'])
+
+def feature_matrix(sents):
+	"""
+	INPUT: list of Sentence objects
+	OUTPUT: 2d np array (one row of features per sentence)
+	"""
+	return np.vstack([sent.get_features(asarray=True) for sent in sents])
+
+def batch_predict_proba(model, sents, chunk_size, X=None):
+	"""
+	INPUT: fitted sklearn classifier, list of Sentences, int, 
+		   (optional) 2d np array (precomputed feature matrix of sents)
+	OUTPUT: 1d np array of floats
+
+	Builds one feature matrix for all of the sentences (unless given) and 
+	returns the positive-class probability of each, calling predict_proba 
+	on chunk_size rows at a time.
+	"""
+
+	probas = np.empty(len(sents))
+
+	if len(sents) == 0:
+		return probas
+
+	if X is None:
+		X = feature_matrix(sents)
+
+	for start in xrange(0, len(sents), chunk_size):
+		probas[start:start+chunk_size] = model.predict_proba(X[start:start+chunk_size])[:,1]
+
+	return probas
+
+class SentimentModel(object):
+
+	SENTIMENT_MODEL = Resource('sentiment_model') # loaded on first use
 
 	def get_positive_proba(self, sent):
 		return SentimentModel.SENTIMENT_MODEL.predict_proba(sent.get_features(asarray=True))[0][1]
 
+	def get_positive_probas(self, sents, chunk_size=1000, X=None):
+		"""
+		INPUT: SentimentModel, list of Sentences, int, (optional) feature matrix of sents
+		OUTPUT: np array of floats
+
+		Batch version of get_positive_proba.
+		"""
+		return batch_predict_proba(SentimentModel.SENTIMENT_MODEL, sents, chunk_size, X=X)
+
 class OpinionModel(object):
 
-	OPINION_MODEL = pickle.load(open('/Users/jeff/Projects/yelp_opinion_mining/modeling/results/final_models/opin_pred.p', 'rb'))
+	OPINION_MODEL = Resource('opinion_model') # loaded on first use
 
 	def get_opinionated_proba(self, sent):
-		return OpinionModel.OPINION_MODEL.predict_proba(sent.get_features(asarray=True))[0][1]
\ No newline at end of file
+		return OpinionModel.OPINION_MODEL.predict_proba(sent.get_features(asarray=True))[0][1]
+
+	def get_opinionated_probas(self, sents, chunk_size=1000, X=None):
+		"""
+		INPUT: OpinionModel, list of Sentences, int, (optional) feature matrix of sents
+		OUTPUT: np array of floats
+
+		Batch version of get_opinionated_proba.
+		"""
+		return batch_predict_proba(OpinionModel.OPINION_MODEL, sents, chunk_size, X=X)
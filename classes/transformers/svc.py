@@ -0,0 +1,225 @@
+import numpy as np
+
+class CompiledSVC(object):
+	"""
+	Class for evaluating a fitted sklearn SVC(probability=True), optionally in a
+	Pipeline after a StandardScaler (as the opinion model is), with plain NumPy.
+
+	The scaler's parameters, the support vectors, dual coefficients, intercept
+	and Platt scaling (probA/probB) parameters are extracted once (from_sklearn)
+	and can be saved to, and loaded from, an .npz file, which needs neither
+	sklearn nor the sklearn version the model was pickled with. Kernel values
+	are computed for a chunk of rows at a time, as libsvm computes them.
+	Binary classification with an rbf or linear kernel only.
+	"""
+
+	KERNELS = ('rbf', 'linear')
+
+	MIN_PROB = 1e-7 # libsvm clips pairwise probabilities to [MIN_PROB, 1 - MIN_PROB]
+	MAX_ITER = 100 # libsvm's iteration limit for multiclass_probability
+
+	def __init__(self, support_vectors, dual_coef, intercept, prob_a, prob_b, kernel='rbf', gamma=None,
+				 mean=None, scale=None, classes=(0, 1)):
+		"""
+		INPUT: CompiledSVC, 2d np array (support vectors), 1d np array (libsvm dual coefficients),
+			   float (libsvm intercept, i.e. -rho), float, float (Platt scaling parameters),
+			   string (kernel), float (rbf gamma), 1d np arrays (scaler mean and scale, or None),
+			   list (class labels)
+		"""
+
+		if kernel not in CompiledSVC.KERNELS:
+			raise ValueError("Unsupported kernel %r (expected one of %s)" % (kernel, ", ".join(CompiledSVC.KERNELS)))
+
+		self.support_vectors = np.asarray(support_vectors, dtype=np.float64)
+		self.dual_coef = np.asarray(dual_coef, dtype=np.float64).ravel()
+		self.intercept = float(intercept)
+		self.prob_a = float(prob_a)
+		self.prob_b = float(prob_b)
+		self.kernel = kernel
+		self.gamma = gamma
+		self.mean = None if mean is None else np.asarray(mean, dtype=np.float64)
+		self.scale = None if scale is None else np.asarray(scale, dtype=np.float64)
+		self.classes_ = np.asarray(classes)
+
+		self.sv_sq_norms = (self.support_vectors ** 2).sum(axis=1)
+
+	@classmethod
+	def from_sklearn(cls, model):
+		"""
+		INPUT: CompiledSVC class, fitted SVC or Pipeline of (optional) StandardScaler and SVC
+		OUTPUT: CompiledSVC
+		"""
+
+		steps = [step for _, step in model.steps] if hasattr(model, 'steps') else [model]
+		scalers, svc = steps[:-1], steps[-1]
+
+		mean = scale = None
+
+		if len(scalers) > 1 or (scalers and type(scalers[0]).__name__ != 'StandardScaler'):
+			raise ValueError("Only a StandardScaler may precede the SVC")
+		elif scalers:
+			scaler = scalers[0]
+			if scaler.with_mean:
+				mean = scaler.mean_
+			if scaler.with_std:
+				scale = scaler.scale_ if hasattr(scaler, 'scale_') else scaler.std_ # std_ in older sklearn
+
+		if len(svc.classes_) != 2 or not getattr(svc, 'probability', False):
+			raise ValueError("Only binary SVCs fit with probability=True are supported")
+
+		# libsvm's own coefficients/intercept (sklearn flips the public ones for binary problems)
+		dual_coef = svc._dual_coef_ if hasattr(svc, '_dual_coef_') else svc.dual_coef_
+		intercept = svc._intercept_ if hasattr(svc, '_intercept_') else svc.intercept_
+
+		gamma = getattr(svc, '_gamma', svc.gamma)
+		if gamma in ('auto', 0.0): # older sklearn used 0.0 for 'auto'
+			gamma = 1.0 / svc.support_vectors_.shape[1]
+
+		return cls(svc.support_vectors_, dual_coef, intercept[0], svc.probA_[0], svc.probB_[0],
+				   kernel=svc.kernel, gamma=gamma, mean=mean, scale=scale, classes=svc.classes_)
+
+	def save(self, path):
+		"""
+		INPUT: CompiledSVC, string (path to .npz file)
+		OUTPUT: None
+		"""
+
+		arrays = {'support_vectors': self.support_vectors,
+				  'dual_coef': self.dual_coef,
+				  'params': np.array([self.intercept, self.prob_a, self.prob_b, self.gamma or 0.0]),
+				  'kernel': np.array(self.kernel),
+				  'classes': self.classes_}
+
+		if self.mean is not None:
+			arrays['mean'] = self.mean
+		if self.scale is not None:
+			arrays['scale'] = self.scale
+
+		with open(path, 'wb') as f:
+			np.savez(f, **arrays)
+
+	@classmethod
+	def load(cls, path):
+		"""
+		INPUT: CompiledSVC class, string (path to .npz file written by save)
+		OUTPUT: CompiledSVC
+		"""
+
+		with np.load(path) as arrays:
+
+			intercept, prob_a, prob_b, gamma = arrays['params']
+
+			return cls(arrays['support_vectors'], arrays['dual_coef'], intercept, prob_a, prob_b,
+					   kernel=str(arrays['kernel']), gamma=gamma,
+					   mean=arrays['mean'] if 'mean' in arrays.files else None,
+					   scale=arrays['scale'] if 'scale' in arrays.files else None,
+					   classes=arrays['classes'])
+
+	def decision_function(self, X):
+		"""
+		INPUT: CompiledSVC, 2d np array (unscaled features)
+		OUTPUT: 1d np array (libsvm decision values)
+		"""
+
+		X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+
+		if self.mean is not None:
+			X = X - self.mean
+		if self.scale is not None:
+			X = X / self.scale
+
+		K = X.dot(self.support_vectors.T)
+
+		if self.kernel == 'rbf':
+			# ||x - sv||^2 = x.x + sv.sv - 2 x.sv
+			K *= -2.0
+			K += (X ** 2).sum(axis=1)[:, np.newaxis]
+			K += self.sv_sq_norms
+			K *= -self.gamma
+			np.exp(K, out=K)
+
+		return K.dot(self.dual_coef) + self.intercept
+
+	def predict_proba(self, X, chunk_size=1000):
+		"""
+		INPUT: CompiledSVC, 2d np array (unscaled features), int (rows per kernel computation)
+		OUTPUT: 2d np array (probability of each class, as sklearn's predict_proba)
+		"""
+
+		X = np.atleast_2d(X)
+		probas = np.empty((X.shape[0], 2))
+
+		for start in xrange(0, X.shape[0], chunk_size):
+			pairwise = self.sigmoid_predict(self.decision_function(X[start:start+chunk_size]))
+			probas[start:start+chunk_size] = self.pairwise_coupling(pairwise)
+
+		return probas
+
+	def sigmoid_predict(self, decision_values):
+		"""
+		INPUT: CompiledSVC, 1d np array (decision values)
+		OUTPUT: 1d np array (Platt-scaled probability of the first class)
+
+		As libsvm's sigmoid_predict, clipped as in svm_predict_probability. 
+		"""
+
+		f = decision_values * self.prob_a + self.prob_b
+
+		p = np.empty_like(f)
+		pos = f >= 0
+		p[pos] = np.exp(-f[pos]) / (1.0 + np.exp(-f[pos])) # computed this way round for stability
+		p[~pos] = 1.0 / (1.0 + np.exp(f[~pos]))
+
+		return np.clip(p, CompiledSVC.MIN_PROB, 1 - CompiledSVC.MIN_PROB)
+
+	def pairwise_coupling(self, r):
+		"""
+		INPUT: CompiledSVC, 1d np array (pairwise probability of the first class)
+		OUTPUT: 2d np array (probability of each class)
+
+		libsvm's multiclass_probability for two classes, which sklearn's libsvm
+		also uses for binary problems: an iterative solve that stops at a loose
+		tolerance, so its output differs slightly from r itself. Each row gets 
+		the same sequence of updates as in libsvm. 
+		"""
+
+		n = len(r)
+
+		# Q = [[q00, q01], [q01, q11]]
+		q00, q01, q11 = (1 - r) * (1 - r), -(1 - r) * r, r * r
+		Q = [[q00, q01], [q01, q11]]
+
+		p = [np.full(n, 0.5), np.full(n, 0.5)]
+		eps = 0.005 / 2
+		active = np.ones(n, dtype=bool)
+
+		for _ in xrange(CompiledSVC.MAX_ITER):
+
+			Qp = [Q[t][0] * p[0] + Q[t][1] * p[1] for t in (0, 1)]
+			pQp = p[0] * Qp[0] + p[1] * Qp[1]
+
+			max_error = np.maximum(np.abs(Qp[0] - pQp), np.abs(Qp[1] - pQp))
+			active &= ~(max_error < eps)
+
+			if not active.any():
+				break
+
+			for t in (0, 1):
+				diff = (-Qp[t] + pQp) / Q[t][t]
+				new_pQp = (pQp + diff * (diff * Q[t][t] + 2 * Qp[t])) / (1 + diff) / (1 + diff)
+				new_Qp = [(Qp[j] + diff * Q[t][j]) / (1 + diff) for j in (0, 1)]
+				new_p = [p[j] + diff if j == t else p[j] for j in (0, 1)]
+				new_p = [new_p[j] / (1 + diff) for j in (0, 1)]
+
+				pQp = np.where(active, new_pQp, pQp)
+				Qp = [np.where(active, new_Qp[j], Qp[j]) for j in (0, 1)]
+				p = [np.where(active, new_p[j], p[j]) for j in (0, 1)]
+
+		return np.column_stack(p)
+
+	def predict(self, X):
+		"""
+		INPUT: CompiledSVC, 2d np array (unscaled features)
+		OUTPUT: 1d np array (class labels, by the sign of the decision value, as libsvm)
+		"""
+		return np.where(self.decision_function(X) > 0, self.classes_[0], self.classes_[1])
@@ -134,11 +134,23 @@ html_entity_digit_re = re.compile(r"&#\d+;")
 html_entity_alpha_re = re.compile(r"&\w+;")
 amp = "&amp;"
 
+# Both kinds of entity, for decoding in a single pass (see PottsTokenizer.fast_html2unicode):
+html_entity_re = re.compile(r"&(?:#(\d+)|(\w+));")
+
+# Characters that could form part of an entity (see PottsTokenizer.fast_html2unicode):
+entity_char_re = re.compile(r"[\w&#;]")
+
 ######################################################################
 
 class PottsTokenizer(object):
-    def __init__(self, preserve_case=False):
+    def __init__(self, preserve_case=False, fast=True):
+        """
+        preserve_case -- if False, downcase everything except emoticons
+        fast -- if True, use fast_html2unicode and a cheaper downcasing
+                (the output is the same either way)
+        """
         self.preserve_case = preserve_case
+        self.fast = fast
 
     def tokenize(self, s):
         """
@@ -151,15 +163,39 @@ class PottsTokenizer(object):
         except UnicodeDecodeError:
             s = str(s).encode('string_escape')
             s = unicode(s)
-        # Fix HTML character entitites:
-        s = self.__html2unicode(s)
+        if not self.fast:
+            # Fix HTML character entitites:
+            s = self.__html2unicode(s)
+            # Tokenize:
+            words = word_re.findall(s)
+            # Possible alter the case, but avoid changing emoticons like :D into :d:
+            if not self.preserve_case:            
+                words = map((lambda x : x if emoticon_re.search(x) else x.lower()), words)
+            return words
+
+        # Fix HTML character entities (there are none without an '&'):
+        if '&' in s:
+            s = self.fast_html2unicode(s)
         # Tokenize:
         words = word_re.findall(s)
-        # Possible alter the case, but avoid changing emoticons like :D into :d:
-        if not self.preserve_case:            
-            words = map((lambda x : x if emoticon_re.search(x) else x.lower()), words)
+        # Possibly alter the case, but avoid changing emoticons like :D into :d
+        # (only a token that downcasing would change needs checking):
+        if not self.preserve_case:
+            lowered = []
+            for word in words:
+                lower = word.lower()
+                lowered.append(lower if lower == word or not emoticon_re.search(word) else word)
+            words = lowered
         return words
 
+    def tokenize_many(self, strings):
+        """
+        Argument: strings -- iterable of string or unicode objects
+        Value: list of the tokenized strings (as lists of strings)
+        """
+        tokenize = self.tokenize
+        return [tokenize(s) for s in strings]
+
     def tokenize_random_tweet(self):
         """
         If the twitter library is installed and a twitter connection
@@ -206,6 +242,43 @@ class PottsTokenizer(object):
             s = s.replace(amp, " and ")
         return s
 
+    def fast_html2unicode(self, s):
+        """
+        Same as __html2unicode, but decodes all the entities in a single
+        pass. That is only equivalent if no decoded numeric entity could 
+        form part of another entity (in __html2unicode, these are decoded 
+        first, and the alpha entities are then found in the result), so in 
+        that (rare) case this falls back on __html2unicode. 
+        """
+        decoded_entity_char = [False] # did a numeric entity decode to e.g. '&'?
+        alpha_entity = [False] # was there an alpha entity other than &amp;?
+
+        def decode(match):
+            ent, num, name = match.group(0), match.group(1), match.group(2)
+            if num is not None:
+                try:
+                    char = unichr(int(num))
+                except (ValueError, OverflowError):
+                    return ent
+                if entity_char_re.match(char):
+                    decoded_entity_char[0] = True
+                return char
+            if ent == amp:
+                return ent
+            alpha_entity[0] = True
+            if name in htmlentitydefs.name2codepoint:
+                return unichr(htmlentitydefs.name2codepoint[name])
+            return ent
+
+        decoded = html_entity_re.sub(decode, s)
+
+        if decoded_entity_char[0]:
+            return self.__html2unicode(s)
+        # __html2unicode only replaces &amp; as part of handling another alpha entity:
+        if alpha_entity[0]:
+            decoded = decoded.replace(amp, " and ")
+        return decoded
+
 ###############################################################################
 
 class MyPottsTokenizer(PottsTokenizer):
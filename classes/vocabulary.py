@@ -0,0 +1,49 @@
+from array import array
+
+class Vocabulary(object):
+	"""
+	Class to intern strings (e.g. tokens or POS tags) as small integer ids,
+	so that Sentences can store typed arrays of ids rather than lists of
+	(often repeated) strings. One Vocabulary is shared by all instances
+	of a class, so ids are only meaningful within a process.
+	"""
+
+	def __init__(self, typecode='i'):
+		"""
+		INPUT: Vocabulary, string (array typecode used for arrays of ids)
+		"""
+
+		self.typecode = typecode
+		self.ids = {} # string -> id
+		self.strings = [] # id -> string
+
+	def intern(self, string):
+		"""
+		INPUT: Vocabulary, string
+		OUTPUT: int (id of the string)
+		"""
+
+		try:
+			return self.ids[string]
+		except KeyError:
+			self.ids[string] = len(self.strings)
+			self.strings.append(string)
+			return self.ids[string]
+
+	def encode(self, strings):
+		"""
+		INPUT: Vocabulary, list of strings
+		OUTPUT: array of ids
+		"""
+		return array(self.typecode, [self.intern(string) for string in strings])
+
+	def decode(self, ids):
+		"""
+		INPUT: Vocabulary, array of ids
+		OUTPUT: list of strings
+		"""
+		strings = self.strings
+		return [strings[i] for i in ids]
+
+	def __len__(self):
+		return len(self.strings)
@@ -1,9 +1,20 @@
+import os
 import json
 import time
+import argparse
+import itertools
+import multiprocessing
 import pandas as pd
 
 from pymongo import MongoClient
 from classes.business import Business
+from classes.sentence import Sentence
+from classes.transformers import resources
+from storage import BulkWriter, SummaryWriter, load_review_analyses
+
+DATA_PATH = './raw_data/yelp_data/processed.csv'
+ANNOTATION_CACHE_PATH = './raw_data/annotations.db' # shared with modeling/1_featurize_training_dat.py
+LEMMA_TABLE_PATH = './raw_data/lemmas.pkl'
 
 def get_reviews_for_business(bus_id, df):
 	"""
@@ -20,36 +31,235 @@ def read_data():
 	INPUT: None
 	OUTPUT: pandas data frame from file
 	"""
-	return pd.read_csv('./raw_data/yelp_data/processed.csv')
+	return pd.read_csv(DATA_PATH)
+
+def group_by_business(df):
+	"""
+	INPUT: pandas DataFrame (reviews for many businesses)
+	OUTPUT: generator of DataFrames, one per business
+
+	Groups the reviews by business in a single pass, in order of 
+	first appearance (rather than re-scanning df for every business). 
+	"""
+	for _, review_df in df.groupby('business_id', sort=False):
+		yield review_df
+
+def is_grouped_by_business(path=DATA_PATH, chunksize=200000):
+	"""
+	INPUT: string (path to csv), int (rows per chunk)
+	OUTPUT: boolean
+
+	Check, in one pass over just the business_id column, that each 
+	business's rows are contiguous in the csv (as stream_businesses requires). 
+	"""
+
+	seen = set() # businesses whose rows have ended
+	current = None
+
+	for chunk in pd.read_csv(path, usecols=['business_id'], chunksize=chunksize):
+		for bus_id in chunk.business_id:
+			if bus_id != current:
+				if bus_id in seen:
+					return False
+				seen.add(current)
+				current = bus_id
+
+	return True
+
+def stream_businesses(path=DATA_PATH, chunksize=20000):
+	"""
+	INPUT: string (path to csv), int (rows per chunk)
+	OUTPUT: generator of DataFrames, one per business
+
+	Reads the csv chunksize rows at a time and yields each business's 
+	reviews as soon as they are complete, so that only about one chunk
+	is in memory at once. Requires the rows to be grouped by business_id, 
+	as written by modeling/0_data_prep.py; check with is_grouped_by_business
+	first, since a business whose rows aren't contiguous would be yielded 
+	in pieces. 
+	"""
+
+	pending = None # rows of the last business in the previous chunk
+
+	for chunk in pd.read_csv(path, chunksize=chunksize):
+
+		if pending is not None:
+			chunk = pd.concat([pending, chunk])
+
+		# the last business in this chunk may continue into the next one
+		is_last = chunk.business_id == chunk.business_id.iloc[-1]
+		pending = chunk[is_last]
+
+		for _, review_df in chunk[~is_last].groupby('business_id', sort=False):
+			yield review_df
+
+	if pending is not None:
+		yield pending
+
+def compile_lemma_table(path=DATA_PATH, chunksize=20000):
+	"""
+	INPUT: string (path to csv), int (rows per chunk)
+	OUTPUT: None
+
+	Precompile the lemma of every word in the review corpus into
+	the Sentence lemmatizer's table (see --compile-lemma-table). 
+	"""
+
+	vocab = set()
+
+	for chunk in pd.read_csv(path, chunksize=chunksize):
+		for tokens in Sentence.WORD_TOKENIZER.tokenize_many(chunk.text.dropna()):
+			vocab.update(tokens)
+
+	Sentence.LEMMATIZER.compile_table(vocab)
+
+def init_worker():
+	"""
+	INPUT: None
+	OUTPUT: None
+
+	Process pool initializer. Loads the models, lexicons and NLTK data 
+	(unless already loaded before the fork), so that each worker pays these 
+	start-up costs once rather than on its first business.
+	"""
+	Sentence.warm_up()
+
+def summarize_business(task):
+	"""
+	INPUT: tuple of (pandas DataFrame of all reviews for one business, 
+		   dict of stored review analyses or None)
+	OUTPUT: tuple of (summary dict, list of new review analyses, 
+			seconds elapsed, score cache report)
+
+	Runs the full analysis for one business. Used both in-process
+	and as the process pool's task. If stored analyses are passed 
+	(incremental mode), only the reviews without one are processed, 
+	and the analyses of those reviews are returned for storage. 
+	"""
+
+	review_df, stored_analyses = task
+
+	print "Working on biz_id %s" % review_df.business_id.iloc[0]
+	start = time.time()
+
+	biz = Business(review_df, stored_analyses=stored_analyses)
+	summary = biz.aspect_based_summary()
+
+	new_analyses = biz.encode_new_reviews() if stored_analyses is not None else []
+
+	if Sentence.ANNOTATION_CACHE:
+		Sentence.ANNOTATION_CACHE.commit()
+
+	return summary, new_analyses, time.time() - start, str(biz.score_cache)
+
+def parse_args():
+	"""
+	INPUT: None
+	OUTPUT: argparse Namespace
+	"""
+
+	parser = argparse.ArgumentParser(description="Generate aspect-based summaries and write them to MongoDB")
+	parser.add_argument('--workers', type=int, default=1,
+						help="number of worker processes to spread businesses across (default: 1, run in-process)")
+	parser.add_argument('--skip', type=int, default=21,
+						help="number of businesses to skip at the start of the data (default: 21)")
+	parser.add_argument('--in-memory', action='store_true',
+						help="load the whole csv and group it in memory, rather than streaming it (done anyway if the csv isn't grouped by business_id)")
+	parser.add_argument('--batch-size', type=int, default=50,
+						help="number of summaries per bulk write to Mongo (default: 50)")
+	parser.add_argument('--flush-interval', type=float, default=60.0,
+						help="max seconds between bulk writes to Mongo (default: 60)")
+	parser.add_argument('--incremental', action='store_true',
+						help="store per-review analyses, and only process reviews that haven't been analyzed before")
+	parser.add_argument('--annotation-cache', default=ANNOTATION_CACHE_PATH,
+						help="path to the on-disk sentence annotation cache, or '' to disable (default: %s)" % ANNOTATION_CACHE_PATH)
+	parser.add_argument('--lemma-table', default=LEMMA_TABLE_PATH,
+						help="path to the precompiled lemma table, loaded at start-up if it exists (default: %s)" % LEMMA_TABLE_PATH)
+	parser.add_argument('--lemma-cache-size', type=int, default=100000,
+						help="max number of (word, POS) lemmas memoized outside the table (default: 100000)")
+	parser.add_argument('--compile-lemma-table', action='store_true',
+						help="precompile the lemma table from the corpus vocabulary, write it to --lemma-table and exit")
+	parser.add_argument('--resource', action='append', default=[], metavar='NAME=PATH',
+						help="override the path of a model/lexicon (one of: %s); may be repeated" % ", ".join(sorted(resources.PATHS)))
+
+	return parser.parse_args()
 
 def main(): 
 
+	args = parse_args()
+
+	resources.configure(**dict([override.split('=', 1) for override in args.resource]))
+
+	if args.compile_lemma_table:
+		print "Compiling lemma table from %s..." % DATA_PATH
+		compile_lemma_table()
+		Sentence.LEMMATIZER.save_table(args.lemma_table)
+		print "Wrote %d lemmas to %s" % (len(Sentence.LEMMATIZER.table), args.lemma_table)
+		return
+
+	Sentence.use_annotation_cache(args.annotation_cache)
+	Sentence.use_lemma_table(args.lemma_table if os.path.exists(args.lemma_table) else None, cache_size=args.lemma_cache_size)
+
 	client = MongoClient()
 	db = client.yelptest2
-	summaries_coll = db.summaries	
+	summaries_coll = db.summaries
+	sentences_coll = db.summary_sentences # sentences that overflow the summaries (see SummaryWriter)
+	analyses_coll = db.review_analyses
 
-	print "Loading data..."
-	df = read_data()
-	bus_ids = df.business_id.unique()[21:]
+	if not args.in_memory:
+		print "Checking that %s is grouped by business..." % DATA_PATH
+		if not is_grouped_by_business():
+			print "%s is not grouped by business_id (re-run 0_data_prep.py to stream it); loading it into memory instead" % DATA_PATH
+			args.in_memory = True
 
-	for bus_id in bus_ids:
+	if args.in_memory:
+		print "Loading data..."
+		review_groups = group_by_business(read_data())
+	else:
+		print "Streaming data from %s..." % DATA_PATH
+		review_groups = stream_businesses()
 
-		print "Working on biz_id %s" % bus_id
-		start = time.time()
+	review_groups = itertools.islice(review_groups, args.skip, None)
 
-		biz = Business(get_reviews_for_business(bus_id,df))
-		summary = biz.aspect_based_summary()
-		
-		summaries_coll.insert(summary)
+	if args.incremental:
+		analyses_coll.create_index('business_id')
+		tasks = ((review_df, load_review_analyses(analyses_coll, review_df.business_id.iloc[0])) for review_df in review_groups)
+	else:
+		tasks = ((review_df, None) for review_df in review_groups)
 
-		print "Inserted summary for %s into Mongo" % biz.business_name
+	if args.workers > 1:
+		print "Loading models and lexicons..."
+		Sentence.warm_up() # before forking, so the workers share them
+		print "Starting %d workers..." % args.workers
+		pool = multiprocessing.Pool(args.workers, initializer=init_worker)
+		results = pool.imap_unordered(summarize_business, tasks)
+	else:
+		pool = None
+		results = (summarize_business(task) for task in tasks)
 
-		elapsed = time.time() - start
-		print "Time elapsed: %d" % elapsed
+	analysis_writer = BulkWriter(analyses_coll, 'review_id', batch_size=100*args.batch_size, flush_interval=args.flush_interval)
 
+	with SummaryWriter(summaries_coll, sentences_coll, batch_size=args.batch_size, flush_interval=args.flush_interval) as writer, analysis_writer:
 
-if __name__ == "__main__":
-	main()
+		for summary, new_analyses, elapsed, cache_report in results:
+
+			for analysis in new_analyses:
+				analysis_writer.add(analysis)
+
+			writer.add(summary)
+
+			print "Queued summary for %s for Mongo (%d written so far)" % (summary['business_name'], writer.n_written)
+			if args.incremental:
+				print "Analyzed %d new reviews" % len(new_analyses)
+			print "Score cache: %s" % cache_report
+			print "Time elapsed: %d" % elapsed
 
+	print "Wrote %d summaries to Mongo" % writer.n_written
 
+	if pool:
+		pool.close()
+		pool.join()
 
+
+if __name__ == "__main__":
+	main()
@@ -132,6 +132,9 @@ if __name__ == "__main__":
 	# merge in the user info
 	review_restaurant_user = review_restaurant.merge(user_df, on='user_id', how='left')
 
+	# group rows by business, so main.py can stream one business at a time
+	review_restaurant_user = review_restaurant_user.sort_values('business_id', kind='mergesort')
+
 	# Write to csv
 	review_restaurant_user.to_csv(OUT_FNAME, encoding='utf-8')
 
@@ -14,6 +14,7 @@ import pandas as pd
 
 PATH_TO_SENT = "/Users/jeff/Projects/yelp_opinion_mining/raw_data/Sentiment/" # hand-tagged training data
 PATH_TO_YELP = '/Users/jeff/Projects/yelp_opinion_mining/raw_data/yelp_data/raw/yelp_academic_dataset_review.json' # raw Yelp data
+PATH_TO_ANNOTATION_CACHE = '/Users/jeff/Projects/yelp_opinion_mining/raw_data/annotations.db' # sentence annotations, shared with main.py
 
 train_fnames = [fname for fname in os.listdir(PATH_TO_SENT) if fname.startswith("Training")]
 
@@ -54,14 +55,18 @@ import sys
 sys.path.append('/Users/jeff/Projects/yelp_opinion_mining')
 from classes.sentence import Sentence
 
+Sentence.use_annotation_cache(PATH_TO_ANNOTATION_CACHE) # re-use annotations across runs
+
 print "Featurizing the training data frame (may take a little while)"
 
 sents = [Sentence(sent) for sent in final_df.sentence]
+Sentence.ANNOTATION_CACHE.commit()
 
 for sent, stars in zip(sents, final_df.review_stars): 
 	sent.stars =  stars # pass the number of stars in
 
-featurized_df = pd.DataFrame([sent.get_features() for sent in sents])
+# columns follow the schema the pipeline featurizes with at serving time
+featurized_df = pd.DataFrame(Sentence.feature_matrix(sents), columns=Sentence.FEATURIZER.feature_names)
 
 featurized_df['sentiment'] = final_df.sentiment
 featurized_df = featurized_df[~featurized_df.sentiment.isnull()]
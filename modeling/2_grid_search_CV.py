@@ -4,15 +4,19 @@
 This file:
 - Reads in the development set
 - Runs a grid search for:
-	- Best OPINION MODEL (opinionated vs. not opinionated)
+	- Best OPINION MODEL (opinionated vs. not opinionated), among SVMs and 
+	  cheaper candidates, reporting AUC vs. inference latency and selecting
+	  under OPINION_LATENCY_BUDGET
 	- Best SENTIMENT MODEL (positive vs. negative, assuming opinionated)
 
 In practice, I have been running this using Domino Data Labs, which 
 
 """
+from sklearn.base import clone
 from sklearn.linear_model import LogisticRegression
 from sklearn.svm import SVC
 from sklearn.pipeline import Pipeline
+from sklearn.kernel_approximation import Nystroem, RBFSampler
 
 from sklearn.preprocessing import StandardScaler
 from sklearn.cross_validation import train_test_split
@@ -23,6 +27,18 @@ from sklearn.metrics import classification_report, roc_curve, auc
 import pylab as pl
 import pandas as pd
 import pickle
+import time
+
+# Latency is reported per this many sentences (about one large business's worth)
+LATENCY_BATCH_SIZE = 1000
+
+# Number of each candidate family's best grid points (by CV AUC) that are refit and timed
+# for the AUC vs. latency frontier; None times every grid point
+TIMED_PER_FAMILY = 5
+
+# Max opinion model latency (seconds per LATENCY_BATCH_SIZE sentences) to select
+# a model under; None selects the best AUC regardless of latency
+OPINION_LATENCY_BUDGET = None
 
 def print_grid_search_results(grid_search, name):
 	"""
@@ -63,9 +79,154 @@ def print_classifier_results(y_true, y_pred, y_proba, name):
 	pl.legend(loc="lower right")
 	pl.savefig("./results/"+name+'.png', format='png')
 
-def run_opinion_grid_search(full_df):
+def opinion_model_candidates():
 	"""
-	Runs SVM grid search for OPINION MODEL
+	Candidate OPINION MODELS, as (name, pipeline, parameter grid). Besides the
+	RBF SVM, includes cheaper models: linear ones, and logistic regressions on
+	approximate RBF kernel features (Nystroem, random Fourier features).
+	"""
+
+	svm = Pipeline([('scaler', StandardScaler()),
+					('clf', SVC(class_weight='auto', probability=True))
+					])
+
+	svm_params = [{'clf__kernel': ['rbf'], 'clf__gamma': [100, 10, 1, 1e-2, 1e-3, 1e-4],'clf__C': [.01, 1, 10, 100, 1000]},
+				  {'clf__kernel': ['linear'], 'clf__C': [.01, 1, 10, 100, 1000]}]
+	# svm_params = [{'clf__kernel': ['rbf']},
+	#  		  {'clf__kernel': ['linear']}]
+
+	logreg = Pipeline([('scaler', StandardScaler()),
+					   ('clf', LogisticRegression(class_weight='auto'))
+					   ])
+
+	logreg_params = {'clf__C': [0.01, 0.1, 1.0, 10.0], 'clf__penalty': ['l1', 'l2']}
+
+	nystroem = Pipeline([('scaler', StandardScaler()),
+						 ('kernel', Nystroem(random_state=117)),
+						 ('clf', LogisticRegression(class_weight='auto'))
+						 ])
+
+	nystroem_params = {'kernel__gamma': [1e-1, 1e-2, 1e-3], 'kernel__n_components': [50, 200], 'clf__C': [0.1, 1.0, 10.0]}
+
+	fourier = Pipeline([('scaler', StandardScaler()),
+						('kernel', RBFSampler(random_state=117)),
+						('clf', LogisticRegression(class_weight='auto'))
+						])
+
+	fourier_params = {'kernel__gamma': [1e-1, 1e-2, 1e-3], 'kernel__n_components': [50, 200], 'clf__C': [0.1, 1.0, 10.0]}
+
+	return [('SVM', svm, svm_params),
+			('LogisticRegression', logreg, logreg_params),
+			('Nystroem_LogisticRegression', nystroem, nystroem_params),
+			('RBFSampler_LogisticRegression', fourier, fourier_params)]
+
+def measure_latency(estimator, X, repeats=5):
+	"""
+	INPUT: fitted estimator, 2d array, int
+	OUTPUT: float (seconds per LATENCY_BATCH_SIZE rows)
+
+	Times batch predict_proba over X (best of several repeats),
+	scaled to a batch of LATENCY_BATCH_SIZE rows. 
+	"""
+
+	best = float('inf')
+
+	for _ in range(repeats):
+		start = time.time()
+		estimator.predict_proba(X)
+		best = min(best, time.time() - start)
+
+	return best * LATENCY_BATCH_SIZE / len(X)
+
+def model_size(estimator):
+	"""
+	INPUT: fitted estimator
+	OUTPUT: int (bytes, pickled)
+	"""
+	return len(pickle.dumps(estimator, pickle.HIGHEST_PROTOCOL))
+
+def evaluate_grid_points(grid_search, candidate_name, X_train, y_train, X_test, y_test, n_best=TIMED_PER_FAMILY):
+	"""
+	INPUT: fitted GridSearchCV, string (candidate family name), train and test sets,
+		   (optional) int (number of best grid points to evaluate; None for all)
+	OUTPUT: list of dicts (one per grid point: its test AUC, latency, size, etc.)
+
+	Refits the n_best grid points with the best CV AUC and measures each one, so 
+	that the frontier can trade a little AUC for e.g. fewer support vectors 
+	(rather than only comparing each family's single best point). 
+	"""
+
+	grid_scores = sorted(grid_search.grid_scores_, key=lambda score: score[1], reverse=True)
+
+	results = []
+
+	for params, cv_auc, _ in grid_scores[:n_best]:
+
+		estimator = clone(grid_search.estimator).set_params(**params).fit(X_train, y_train)
+		fpr, tpr, _ = roc_curve(y_test, estimator.predict_proba(X_test)[:,1])
+		clf = estimator.steps[-1][1]
+
+		results.append({'name': candidate_name,
+						'params': params,
+						'estimator': estimator,
+						'cv_auc': cv_auc,
+						'auc': auc(fpr, tpr),
+						'latency': measure_latency(estimator, X_test),
+						'size': model_size(estimator),
+						'n_support': len(clf.support_) if hasattr(clf, 'support_') else '-'})
+
+	return results
+
+def pareto_frontier(results):
+	"""
+	INPUT: list of dicts with 'cv_auc' and 'latency' keys
+	OUTPUT: list of those dicts not beaten on both CV AUC and latency by another, fastest first
+	"""
+
+	frontier = []
+
+	for result in sorted(results, key=lambda r: (r['latency'], -r['cv_auc'])):
+		if not frontier or result['cv_auc'] > frontier[-1]['cv_auc']:
+			frontier.append(result)
+
+	return frontier
+
+def select_model(results, latency_budget=None):
+	"""
+	INPUT: list of dicts with 'cv_auc' and 'latency' keys, (optional) float (seconds per LATENCY_BATCH_SIZE rows)
+	OUTPUT: dict (the result with the best CV AUC among those within the budget)
+
+	With no budget (or if nothing is within it) returns the best CV AUC overall,
+	i.e. the grid search's own best_estimator_. Selection never looks at the 
+	test AUC, so that it stays an unbiased estimate for the model chosen. 
+	"""
+
+	within_budget = [r for r in results if latency_budget is None or r['latency'] <= latency_budget]
+
+	if not within_budget:
+		print "No model is within the latency budget of %.4fs; using the best CV AUC overall" % latency_budget
+		within_budget = results
+
+	return max(within_budget, key=lambda r: r['cv_auc'])
+
+def print_frontier(results, frontier):
+	"""
+	Print out AUC, latency and size of every candidate, marking the frontier
+	"""
+
+	print "Opinion model candidates (latency is predict_proba per %d sentences):" % LATENCY_BATCH_SIZE
+	print "%-32s %8s %8s %12s %12s %10s" % ('', 'CV AUC', 'AUC', 'latency (s)', 'size (KB)', 'n_SV')
+	for r in sorted(results, key=lambda r: r['latency']):
+		print "%-32s %8.3f %8.3f %12.4f %12.1f %10s %s %r" % (r['name'], r['cv_auc'], r['auc'], r['latency'], r['size'] / 1024.0, r['n_support'], 
+															  '*' if r in frontier else ' ', r['params'])
+	print "(* = on the CV AUC vs. latency frontier)"
+	print ""
+
+def run_opinion_grid_search(full_df, latency_budget=None):
+	"""
+	Runs grid searches over the candidate OPINION MODELS, then picks, among
+	the best TIMED_PER_FAMILY grid points of each, the one with the best CV 
+	ROC AUC whose batch latency is within budget (test AUC is only reported)
 	"""
 	name = "Opinion_Model"
 
@@ -77,31 +238,35 @@ def run_opinion_grid_search(full_df):
 	print "%s model train size: %d" % (name, len(y_train))
 	print "%s model test size: %d" % (name, len(y_test))
 
-	scaler = StandardScaler()
+	results = []
 
-	pipeline = Pipeline([('scaler', StandardScaler()),
-						 	  ('clf', SVC(class_weight='auto', probability=True))
-							])
+	for candidate_name, pipeline, params in opinion_model_candidates():
 
-	params = [{'clf__kernel': ['rbf'], 'clf__gamma': [100, 10, 1, 1e-2, 1e-3, 1e-4],'clf__C': [.01, 1, 10, 100, 1000]},
-	 			  {'clf__kernel': ['linear'], 'clf__C': [.01, 1, 10, 100, 1000]}]
-	# params = [{'clf__kernel': ['rbf']},
-	#  		  {'clf__kernel': ['linear']}]
+		grid_search = GridSearchCV(pipeline, params, n_jobs = -1, verbose=.5, scoring='roc_auc')
 
-	grid_search = GridSearchCV(pipeline, params, n_jobs = -1, verbose=.5, scoring='roc_auc')
+		# run the grid search
+		grid_search.fit(X_train, y_train)
 
-	# run the grid search
-	grid_search.fit(X_train, y_train)
+		# print results
+		print_grid_search_results(grid_search, "%s (%s)" % (name, candidate_name))
 
-	# print results
-	print_grid_search_results(grid_search, name)	
+		for result in evaluate_grid_points(grid_search, candidate_name, X_train, y_train, X_test, y_test):
+			result['grid_search'] = grid_search
+			results.append(result)
 
-	y_true, y_pred =  y_test, grid_search.best_estimator_.predict(X_test)
-	y_proba = grid_search.best_estimator_.predict_proba(X_test)[:,1]
+	print_frontier(results, pareto_frontier(results))
+
+	chosen = select_model(results, latency_budget)
+
+	print "Chose %s %r (CV AUC %.3f, %.4fs per %d sentences)" % (chosen['name'], chosen['params'], chosen['cv_auc'], chosen['latency'], LATENCY_BATCH_SIZE)
+	print ""
+
+	y_true, y_pred =  y_test, chosen['estimator'].predict(X_test)
+	y_proba = chosen['estimator'].predict_proba(X_test)[:,1]
 
 	print_classifier_results(y_true, y_pred, y_proba, name)
 
-	return grid_search, grid_search.best_estimator_.fit(X, y)
+	return chosen['grid_search'], clone(chosen['estimator']).fit(X, y)
 
 
 def run_senti_grid_search(full_df):
@@ -153,7 +318,7 @@ if __name__ == "__main__":
 	print ""
 	print development_df.opinionated.value_counts()
 
-	opin_gs, opin_best_est = run_opinion_grid_search(development_df)
+	opin_gs, opin_best_est = run_opinion_grid_search(development_df, latency_budget=OPINION_LATENCY_BUDGET)
 
 	senti_gs, senti_best_est = run_senti_grid_search(development_df)
 
@@ -0,0 +1,187 @@
+"""
+storage.py
+
+Classes for writing YUMM's pipeline output to MongoDB.
+"""
+
+import time
+
+from datetime import datetime
+
+from pymongo import ReplaceOne, DeleteMany, InsertOne, ASCENDING, DESCENDING
+from pymongo.errors import AutoReconnect
+
+def load_review_analyses(collection, business_id):
+	"""
+	INPUT: pymongo Collection, string (business id)
+	OUTPUT: dict mapping review_id to stored review analysis
+
+	Fetch the stored per-review analyses for one business (see 
+	Business.encode_new_reviews).
+	"""
+	return dict([(analysis['review_id'], analysis) for analysis in collection.find({'business_id': business_id}, {'_id': 0})])
+
+class BulkWriter(object):
+	"""
+	Class to buffer documents and write them to MongoDB in bulk. Each
+	document is upserted by its key field, so re-running the pipeline
+	replaces a document instead of adding a duplicate. The buffer is 
+	flushed once it holds batch_size documents, or when a document is
+	added more than flush_interval seconds after the last flush. Flushes
+	that hit transient connection failures are retried with backoff.
+
+	Use as a context manager (or call close()) so the last batch is written.
+	"""
+
+	def __init__(self, collection, key, batch_size=50, flush_interval=60.0, max_retries=5, retry_delay=1.0):
+		"""
+		INPUT: pymongo Collection, string (key field), int, float (seconds), int, float (seconds)
+		"""
+
+		self.collection = collection
+		self.key = key
+		self.batch_size = batch_size
+		self.flush_interval = flush_interval
+		self.max_retries = max_retries
+		self.retry_delay = retry_delay
+
+		self.buffer = {} # key -> document
+		self.last_flush = time.time()
+		self.n_written = 0
+		self.indexed = False # whether the key index has been ensured
+
+	def add(self, doc):
+		"""
+		INPUT: BulkWriter, dict
+		OUTPUT: None
+
+		Buffer a document, flushing if the batch is full or stale.
+		"""
+
+		self.buffer[doc[self.key]] = doc
+
+		if len(self.buffer) >= self.batch_size or time.time() - self.last_flush >= self.flush_interval:
+			self.flush()
+
+	def flush(self):
+		"""
+		INPUT: BulkWriter
+		OUTPUT: int (number of documents written)
+
+		Upsert all buffered documents in a single bulk write.
+		"""
+
+		if not self.buffer:
+			self.last_flush = time.time()
+			return 0
+
+		if not self.indexed:
+			self.with_retries(self.collection.create_index, self.key)
+			self.indexed = True
+
+		requests = [ReplaceOne({self.key: key}, doc, upsert=True) for key, doc in self.buffer.iteritems()]
+		self.with_retries(self.collection.bulk_write, requests, ordered=False)
+
+		n_flushed = len(requests)
+		self.n_written += n_flushed
+		self.buffer = {}
+		self.last_flush = time.time()
+
+		return n_flushed
+
+	def with_retries(self, func, *args, **kwargs):
+		"""
+		INPUT: BulkWriter, function, arguments
+		OUTPUT: result of the call
+
+		Call func, retrying with exponential backoff if the connection to
+		Mongo fails transiently. Upserts are idempotent, so retrying a
+		partially-applied bulk write is safe.
+		"""
+
+		for attempt in xrange(self.max_retries + 1):
+			try:
+				return func(*args, **kwargs)
+			except AutoReconnect:
+				if attempt == self.max_retries:
+					raise
+				time.sleep(self.retry_delay * 2**attempt)
+
+	def close(self):
+		"""
+		INPUT: BulkWriter
+		OUTPUT: None
+
+		Write anything left in the buffer.
+		"""
+		self.flush()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+class SummaryWriter(BulkWriter):
+	"""
+	BulkWriter for business summaries (as output by Business.aspect_based_summary),
+	upserted by business_id. Each summary is stamped with the (UTC) time it was 
+	queued as updated_at, which readers (e.g. the web app) use to tell when
+	summaries have changed. 
+
+	A summary's overflow_sentences (the sentences beyond the top k per aspect and 
+	polarity) are written to their own collection, one document per sentence,
+	replacing those from any earlier summary of the business. They are written
+	before the summaries, so a summary's updated_at only changes once its
+	sentences are in place. They are discarded if no overflow collection is given.
+	"""
+
+	# index for reading one aspect and polarity's sentences, most confident first
+	OVERFLOW_INDEX = [('business_id', ASCENDING), ('aspect', ASCENDING), ('polarity', ASCENDING), ('confidence', DESCENDING)]
+
+	def __init__(self, collection, overflow_collection=None, **kwargs):
+		"""
+		INPUT: SummaryWriter, pymongo Collection (summaries), 
+			   (optional) pymongo Collection (overflow sentences), BulkWriter arguments
+		"""
+
+		super(SummaryWriter, self).__init__(collection, 'business_id', **kwargs)
+
+		self.overflow_collection = overflow_collection
+		self.overflow = {} # business_id -> list of overflow sentences, for the buffered summaries
+
+	def add(self, doc):
+		"""
+		INPUT: SummaryWriter, dict
+		OUTPUT: None
+		"""
+
+		self.overflow[doc['business_id']] = doc.pop('overflow_sentences', [])
+
+		doc['updated_at'] = datetime.utcnow()
+		super(SummaryWriter, self).add(doc)
+
+	def flush(self):
+		"""
+		INPUT: SummaryWriter
+		OUTPUT: int (number of documents written)
+		"""
+
+		if self.buffer and not self.indexed:
+			self.with_retries(self.collection.create_index, 'updated_at') # readers look up the latest
+			if self.overflow_collection is not None:
+				self.with_retries(self.overflow_collection.create_index, SummaryWriter.OVERFLOW_INDEX)
+
+		if self.overflow_collection is not None and self.overflow:
+
+			requests = []
+			for business_id, sents in self.overflow.iteritems():
+				requests.append(DeleteMany({'business_id': business_id}))
+				requests.extend([InsertOne(sent) for sent in sents])
+
+			# ordered, so each business's old sentences are deleted before its new ones go in
+			self.with_retries(self.overflow_collection.bulk_write, requests, ordered=True)
+
+		self.overflow = {}
+
+		return super(SummaryWriter, self).flush()
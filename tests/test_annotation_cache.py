@@ -0,0 +1,100 @@
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+import unittest
+import multiprocessing
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'classes'))
+
+from annotation_cache import AnnotationCache
+
+ANNOTATIONS = {'tokenized': ['the', 'food', 'was', 'great'], 'aspect_spans': [(1, 2)]}
+
+CACHE = None # inherited by forked pool workers, as Sentence.ANNOTATION_CACHE is in main.py
+
+def put_and_commit(raw):
+	"""
+	Pool task: write one entry through the cache inherited from the parent.
+	"""
+	CACHE.put(raw, ANNOTATIONS)
+	CACHE.commit()
+	return raw
+
+class AnnotationCacheTest(unittest.TestCase):
+
+	def setUp(self):
+		self.dir = tempfile.mkdtemp()
+		self.path = os.path.join(self.dir, 'annotations.db')
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def test_round_trip(self):
+		cache = AnnotationCache(self.path, 'v1')
+		self.assertIsNone(cache.get("The food was great."))
+
+		cache.put("The food was great.", ANNOTATIONS)
+		self.assertEqual(cache.get("The food was great."), ANNOTATIONS) # buffered writes are visible
+
+		cache.commit()
+		self.assertEqual(AnnotationCache(self.path, 'v1').get("The food was great."), ANNOTATIONS)
+
+	def test_other_versions_dropped(self):
+		cache = AnnotationCache(self.path, 'v1')
+		cache.put("The food was great.", ANNOTATIONS)
+		cache.commit()
+
+		self.assertIsNone(AnnotationCache(self.path, 'v2').get("The food was great."))
+		self.assertIsNone(AnnotationCache(self.path, 'v1').get("The food was great."))
+
+	def test_no_open_transaction_between_commits(self):
+		cache = AnnotationCache(self.path, 'v1', commit_every=500)
+		cache.put("The food was great.", ANNOTATIONS)
+
+		other = sqlite3.connect(self.path, timeout=0.1)
+		other.execute("BEGIN IMMEDIATE") # would fail if the cache held the write lock
+		other.rollback()
+
+	def test_locked_database_is_a_miss(self):
+		cache = AnnotationCache(self.path, 'v1', timeout=0.1)
+		cache.put("The food was great.", ANNOTATIONS)
+		cache.commit()
+
+		other = sqlite3.connect(self.path)
+		other.execute("BEGIN EXCLUSIVE")
+
+		try:
+			locked = AnnotationCache(self.path, 'v1', timeout=0.1)
+			self.assertIsNone(locked.get("The food was great."))
+
+			locked.put("The service was slow.", ANNOTATIONS)
+			locked.commit() # dropped, not raised
+		finally:
+			other.rollback()
+
+		self.assertIsNone(AnnotationCache(self.path, 'v1').get("The service was slow."))
+
+	def test_forked_workers_with_uncommitted_parent(self):
+		global CACHE
+
+		CACHE = AnnotationCache(self.path, 'v1', timeout=5)
+		CACHE.put("The food was great.", ANNOTATIONS) # buffered in the parent when the pool forks
+		CACHE.get("The food was great.") # and the parent's connection is open
+
+		pool = multiprocessing.Pool(2)
+		try:
+			raws = pool.map(put_and_commit, ["Sentence %d." % i for i in range(8)])
+		finally:
+			pool.close()
+			pool.join()
+
+		CACHE.commit()
+
+		fresh = AnnotationCache(self.path, 'v1')
+		for raw in raws + ["The food was great."]:
+			self.assertEqual(fresh.get(raw), ANNOTATIONS)
+
+if __name__ == '__main__':
+	unittest.main()
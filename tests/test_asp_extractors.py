@@ -0,0 +1,101 @@
+import os
+import re
+import sys
+import random
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'classes'))
+
+from transformers import resources
+from transformers.asp_extractors import SentenceAspectExtractor
+
+STOPWORDS = set(['the', 'a', 'of', 'and', 'in', 'it', "it's", 'was', 'i', 'star', 'time', ''])
+
+# weighted towards the tags GRAMMAR chunks, so that long NBAR runs and IN/CC chains are common
+TAGS = ['NN'] * 4 + ['NNS', 'NNP', 'NNPS'] + ['JJ'] * 4 + ['IN', 'IN', 'CC', 'CC', 'DT', 'VBD', 'RB', 'PRP', '.', ',', 'JJR']
+
+WORDS = ['pizza', 'crust', 'service', 'chicken', 'tea', 'staff', 'price'] + list(STOPWORDS) + \
+		['great', 'good', 'friends', 'way'] + list("\".:;!?')(/") + ['-', '...']
+
+class StubSentence(object):
+	"""
+	Stand-in for Sentence, which only needs its POS tags here.
+	"""
+
+	def __init__(self, pos_tagged):
+		self.pos_tagged = pos_tagged
+
+def old_valid_aspect(aspect):
+	"""
+	valid_aspect as it was before the set-based rewrite, to check against
+	"""
+
+	no_stops = [w for w in aspect if w not in STOPWORDS and not SentenceAspectExtractor.PUNCT_RE.match(w)]
+
+	if len(no_stops) < 1:
+		return False
+	elif any([forbid_wrd in aspect for forbid_wrd in SentenceAspectExtractor.FORBIDDEN]):
+		return False
+	else:
+		return True
+
+def random_tagged_sentences(n, seed=117):
+	"""
+	INPUT: int (number of sentences), int (random seed)
+	OUTPUT: list of lists of (word, tag) tuples
+	"""
+
+	rand = random.Random(seed)
+	return [[(rand.choice(WORDS), rand.choice(TAGS)) for _ in range(rand.randint(1, 25))] for _ in range(n)]
+
+class SentenceAspectExtractorTest(unittest.TestCase):
+
+	def setUp(self):
+		self.stopwords = resources.LOADED.get('aspect_stopwords')
+		resources.LOADED['aspect_stopwords'] = STOPWORDS # rather than loading nltk's stopword corpus
+
+		self.extractor = SentenceAspectExtractor()
+		self.sents = random_tagged_sentences(5000)
+
+	def tearDown(self):
+		if self.stopwords is None:
+			resources.LOADED.pop('aspect_stopwords', None)
+		else:
+			resources.LOADED['aspect_stopwords'] = self.stopwords
+
+	def test_chunk_NP_spans_matches_regexp_parser(self):
+		for tagged in self.sents:
+			tree = SentenceAspectExtractor.CHUNKER.parse(tagged)
+			tags = tuple([t for w, t in tagged])
+			self.assertEqual(self.extractor.chunk_NP_spans(tags), self.extractor.get_NP_spans(tree), tags)
+
+	def test_link_chains_and_adjective_tails(self):
+		tags = ('JJ', 'NN', 'IN', 'NN', 'CC', 'NNS', 'IN', 'JJ', 'NN', 'JJ', 'DT', 'NN', 'JJ', 'JJ')
+		tree = SentenceAspectExtractor.CHUNKER.parse([('w', t) for t in tags])
+
+		# NBAR IN NBAR is taken leftmost first, so the NN before the CC is already used; trailing JJs are no NBAR
+		self.assertEqual(self.extractor.chunk_NP_spans(tags), [(0, 4), (5, 9), (11, 12)])
+		self.assertEqual(self.extractor.chunk_NP_spans(tags), self.extractor.get_NP_spans(tree))
+
+	def test_memo_is_bounded(self):
+		self.extractor.MAX_CACHED_TAG_SEQUENCES = 10
+
+		for tagged in self.sents[:100]:
+			self.extractor.chunk_NP_spans(tuple([t for w, t in tagged]))
+
+		self.assertTrue(len(self.extractor.np_spans_cache) <= 10)
+
+	def test_valid_aspect_matches_old_version(self):
+		rand = random.Random(117)
+
+		for _ in range(5000):
+			aspect = [rand.choice(WORDS) for _ in range(rand.randint(1, 4))]
+			self.assertEqual(self.extractor.valid_aspect(aspect), old_valid_aspect(aspect), aspect)
+
+	def test_aspect_spans_match_regexp_path(self):
+		for tagged in self.sents:
+			sent = StubSentence(tagged)
+			self.assertEqual(self.extractor.get_sent_aspect_spans(sent), self.extractor.get_sent_aspect_spans_regexp(sent))
+
+if __name__ == '__main__':
+	unittest.main()
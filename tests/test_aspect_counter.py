@@ -0,0 +1,143 @@
+from __future__ import division
+
+import os
+import sys
+import math
+import random
+import unittest
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'classes'))
+
+from aspect_counter import AspectCounter
+from business import Business
+
+def zipf_stream(n, n_items=2000, seed=117):
+	"""
+	INPUT: int (stream length), int (number of distinct items), int (random seed)
+	OUTPUT: list of strings, with a long tail of rare items (as aspect candidates have)
+	"""
+
+	rand = random.Random(seed)
+	weights = [1 / (rank + 1) for rank in range(n_items)]
+	total = sum(weights)
+
+	stream = []
+	for _ in range(n):
+		r = rand.random() * total
+		for rank, weight in enumerate(weights):
+			r -= weight
+			if r <= 0:
+				break
+		stream.append("item%d" % rank)
+
+	return stream
+
+class StubSentence(object):
+	"""
+	Stand-in for Sentence, which only needs its aspects here.
+	"""
+
+	def __init__(self, aspects):
+		self.aspects = aspects
+
+class AspectCounterTest(unittest.TestCase):
+
+	def test_prune_at_bucket_boundaries(self):
+		counter = AspectCounter(epsilon=0.25) # buckets of 4 items
+
+		for item in ['a', 'a', 'b', 'c']:
+			counter.add(item)
+
+		# end of bucket 1: only items seen more than once survive
+		self.assertEqual(counter.entries, {'a': [2, 0]})
+
+		for item in ['d', 'd', 'd', 'e']:
+			counter.add(item)
+
+		# end of bucket 2: 'd' entered in bucket 2 (so may have been missed once before), 'a' is now too rare
+		self.assertEqual(counter.entries, {'d': [3, 1]})
+		self.assertEqual(dict(counter.upper_bounds()), {'d': 4})
+		self.assertEqual(counter.max_error(), 2)
+
+	def test_error_bounds(self):
+		epsilon = 0.01
+		stream = zipf_stream(20000)
+
+		counter = AspectCounter(epsilon)
+		true_counts = Counter()
+
+		for i, item in enumerate(stream):
+			counter.add(item)
+			true_counts[item] += 1
+
+			if (i + 1) % counter.bucket_width == 0: # just pruned
+				for held, upper_bound in counter.upper_bounds():
+					self.assertTrue(upper_bound >= true_counts[held])
+
+		max_error = counter.max_error()
+		self.assertEqual(max_error, 200)
+
+		for item, count in true_counts.iteritems():
+			if item in counter.entries:
+				self.assertTrue(true_counts[item] >= counter.entries[item][0] >= true_counts[item] - max_error)
+				self.assertTrue(dict(counter.upper_bounds())[item] >= true_counts[item])
+			else:
+				self.assertTrue(count <= max_error, item) # only rare items are dropped
+
+		self.assertTrue(len(counter) < len(true_counts))
+		self.assertTrue(len(counter) <= (1 / epsilon) * math.log(epsilon * len(stream)))
+
+class BusinessAspectsTest(unittest.TestCase):
+
+	def setUp(self):
+		self.biz = Business.__new__(Business) # without reviews, models or lexicons
+
+	def test_filter_single_asps(self):
+		single_asps = [('chicken', 50), ('tea', 40), ('pesto', 30), ('service', 20)]
+		multi_asps = [('pesto chicken', 10), ('steak', 5), ('green tea latte', 4)]
+
+		self.assertEqual(self.biz.filter_single_asps(single_asps, multi_asps), [('service', 20)])
+		self.assertEqual(self.biz.filter_single_asps(single_asps, [('pesto chicken', 10), ('steak', 5)]),
+						 [('tea', 40), ('service', 20)])
+
+	def test_extract_aspects_matches_exact_counts(self):
+		rand = random.Random(117)
+		singles = zipf_stream(6000, n_items=300, seed=1)
+		multis = [" ".join(["multi%d" % (int(item[4:]) % 40), item]) for item in zipf_stream(3000, n_items=300, seed=2)]
+
+		reviews = []
+		for _ in range(100):
+			review = []
+			for _ in range(rand.randint(5, 40)):
+				aspects = [[rand.choice(singles)] for _ in range(rand.randint(0, 2))] + \
+						  [rand.choice(multis).split(" ") for _ in range(rand.randint(0, 1))]
+				review.append(StubSentence(aspects))
+			reviews.append(review)
+
+		biz = self.biz
+		biz.sentences = [sent for review in reviews for sent in review]
+		biz.n_sents = 0
+		biz.single_asp_counter = AspectCounter(0.001)
+		biz.multi_asp_counter = AspectCounter(0.001)
+
+		for review in reviews:
+			biz.count_aspects(review)
+
+		# the same aspects, from exact counts of every candidate
+		n_sents = len(biz.sentences)
+		counts = Counter([" ".join(asp) for sent in biz.sentences for asp in sent.aspects])
+
+		self.assertTrue(len(biz.single_asp_counter) < len([asp for asp in counts if " " not in asp])) # some were pruned
+		single_asps = [(asp, count) for asp, count in counts.iteritems() if " " not in asp and count/n_sents > 0.012]
+		multi_asps = [(asp, count) for asp, count in counts.iteritems() if " " in asp and count/n_sents > 0.003]
+		expected = biz.filter_single_asps(single_asps, multi_asps) + multi_asps
+
+		aspects = biz.extract_aspects()
+
+		self.assertTrue(len(aspects) > 10)
+		self.assertEqual(sorted(aspects), sorted([asp for asp, _ in expected]))
+		self.assertEqual([counts[asp] for asp in aspects], sorted([count for _, count in expected]))
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,138 @@
+import os
+import sys
+import random
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'classes'))
+
+from transformers.featurizers import MetaFeaturizer, SubjFeaturizer, LiuFeaturizer, LexiconFeaturizer
+
+SUBJ_LEXICON = [('strongsubj', 'great', 'adj'),
+				('strongsubj', 'love', 'verb'),
+				('weaksubj', 'love', 'noun'),
+				('weaksubj', 'bland', 'anypos'),
+				('strongsubj', 'terrible', 'anypos'),
+				('weaksubj', 'slow', 'adj'),
+				('weaksubj', 'Ne', 'anypos'),
+				('strongsubj', 'ne', 'adverb')]
+
+POS_WORDS = ['great', 'good', 'love', 'delicious', 'friendly', 'GE', 'e']
+NEG_WORDS = ['bad', 'bland', 'terrible', 'slow', 'rude', 'N', 'Go']
+
+# tokens that exercise negation marking, clause punctuation and the "_NEG"-stripping quirk
+OTHER_WORDS = ['the', 'food', 'service', 'was', 'is', 'not', 'never', "don't", "isn't", 'no', 'will', 'can', 
+			   'i', 'it', 'we', '3', '.', ',', '!', '?', ';', ':', 'and', 'but', 'NEG', '_NEG', 'good_', 'G_', 'EN']
+
+TAGS = ['NN', 'NNS', 'NNP', 'NNPS', 'JJ', 'JJR', 'JJS', 'RB', 'RBR', 'RBS', 'VB', 'VBD', 'VBZ', 
+		'PRP', 'PRP$', 'CD', 'MD', 'DT', 'IN', 'CC', '.', ',']
+
+class StubSentence(object):
+	"""
+	Stands in for a Sentence: just the annotations the featurizers read.
+	"""
+
+	def __init__(self, tokens, tags, lemmas, stars):
+		self.tokenized = tokens
+		self.pos_tagged = zip(tokens, tags)
+		self.lemmatized = zip(lemmas, tags)
+		self.stars = stars
+
+def random_sentences(n, seed=117):
+	"""
+	INPUT: int, int (random seed)
+	OUTPUT: list of StubSentences
+	"""
+
+	rng = random.Random(seed)
+	vocab = POS_WORDS + NEG_WORDS + OTHER_WORDS
+	sents = []
+
+	for _ in xrange(n):
+		length = rng.randint(1, 25)
+		tokens = [rng.choice(vocab) for _ in xrange(length)]
+		tags = [rng.choice(TAGS) for _ in xrange(length)]
+		lemmas = [tok if rng.random() < 0.8 else tok.rstrip('s') for tok in tokens]
+		sents.append(StubSentence(tokens, tags, lemmas, rng.randint(1, 5)))
+
+	return sents
+
+def write_lexicons(lexicons_dir):
+	"""
+	INPUT: string (directory)
+	OUTPUT: string (path to the subjectivity lexicon)
+
+	Writes small lexicons in the formats of the subjectivity clues and Liu lexicons.
+	"""
+
+	subj_path = os.path.join(lexicons_dir, 'subjclueslen1.tff')
+	with open(subj_path, 'w') as f:
+		for subj_type, word, pos in SUBJ_LEXICON:
+			f.write("type=%s len=1 word1=%s pos1=%s stemmed1=n priorpolarity=neutral\n" % (subj_type, word, pos))
+
+	os.mkdir(os.path.join(lexicons_dir, 'Liu'))
+	for name, words in (('positive-words.txt', POS_WORDS), ('negative-words.txt', NEG_WORDS)):
+		with open(os.path.join(lexicons_dir, 'Liu', name), 'w') as f:
+			f.write(";; Opinion Lexicon\n;;\n\n" + "\n".join(words) + "\n")
+
+	return subj_path
+
+class FeaturizerTestCase(unittest.TestCase):
+
+	def setUp(self):
+		self.dir = tempfile.mkdtemp()
+		subj_path = write_lexicons(self.dir)
+
+		self.subj = SubjFeaturizer(subj_path)
+		self.liu = LiuFeaturizer(self.dir)
+		self.sents = random_sentences(3000)
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+class LexiconFeaturizerTest(FeaturizerTestCase):
+
+	def test_lexicons_read(self):
+		self.assertEqual(self.liu.pos_lex, set(POS_WORDS))
+		self.assertEqual(self.liu.neg_lex, set(NEG_WORDS))
+		self.assertEqual(self.subj.lex_dict[('love', 'verb')]['type'], 'strongsubj')
+
+	def test_parity_with_separate_featurizers(self):
+		lexicon_featurizer = LexiconFeaturizer(self.subj, self.liu)
+
+		for sent in self.sents:
+			expected = dict(self.subj.featurize(sent).items() + self.liu.featurize(sent).items())
+			self.assertEqual(lexicon_featurizer.featurize(sent), expected, "features differ for %r" % (sent.pos_tagged,))
+
+	def test_negation_flips_polarity(self):
+		lexicon_featurizer = LexiconFeaturizer(self.subj, self.liu)
+		sent = StubSentence(['not', 'good', '.', 'good'], ['RB', 'JJ', '.', 'JJ'], ['not', 'good', '.', 'good'], 3)
+
+		features = lexicon_featurizer.featurize(sent)
+		self.assertEqual(features['raw'], 0)
+		self.assertEqual(features['frac_pos'], 0.25)
+		self.assertEqual(features['frac_neg'], 0.25)
+
+class FeaturizeBatchTest(FeaturizerTestCase):
+
+	def featurizers(self):
+		return [MetaFeaturizer([self.subj, self.liu]), MetaFeaturizer([LexiconFeaturizer(self.subj, self.liu)])]
+
+	def test_schema(self):
+		for featurizer in self.featurizers():
+			self.assertEqual(list(featurizer.feature_names), featurizer.featurize(self.sents[0]).keys())
+
+	def test_parity_with_dict_path(self):
+		for featurizer in self.featurizers():
+			# as Sentence.get_features(asarray=True) builds each row
+			expected = np.vstack([np.array([val for _, val in featurizer.featurize(sent).iteritems()]) for sent in self.sents])
+			self.assertTrue(np.array_equal(featurizer.featurize_batch(self.sents), expected))
+
+	def test_empty_batch(self):
+		for featurizer in self.featurizers():
+			self.assertEqual(featurizer.featurize_batch([]).shape, (0, len(featurizer.feature_names)))
+
+if __name__ == '__main__':
+	unittest.main()
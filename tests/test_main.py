@@ -0,0 +1,50 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import main
+
+class StreamBusinessesTest(unittest.TestCase):
+
+	def setUp(self):
+		self.dir = tempfile.mkdtemp()
+		self.path = os.path.join(self.dir, 'reviews.csv')
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def write_csv(self, business_ids):
+		pd.DataFrame({'business_id': business_ids,
+					  'review_id': ['r%d' % i for i in range(len(business_ids))],
+					  'text': ['Great food.'] * len(business_ids)}).to_csv(self.path, index=False)
+
+	def test_grouped(self):
+		business_ids = ['a'] * 5 + ['b'] * 3 + ['c'] * 7
+		self.write_csv(business_ids)
+
+		self.assertTrue(main.is_grouped_by_business(self.path, chunksize=4))
+
+		groups = list(main.stream_businesses(self.path, chunksize=4))
+		self.assertEqual([list(df.business_id.unique()) for df in groups], [['a'], ['b'], ['c']])
+		self.assertEqual([len(df) for df in groups], [5, 3, 7])
+
+	def test_not_grouped_across_chunks(self):
+		self.write_csv(['a'] * 5 + ['b'] * 3 + ['a'] * 2)
+		self.assertFalse(main.is_grouped_by_business(self.path, chunksize=4))
+
+	def test_not_grouped_within_chunk(self):
+		self.write_csv(['a', 'b', 'a', 'c'])
+		self.assertFalse(main.is_grouped_by_business(self.path, chunksize=100))
+
+	def test_single_business(self):
+		self.write_csv(['a'] * 3)
+		self.assertTrue(main.is_grouped_by_business(self.path))
+		self.assertEqual([len(df) for df in main.stream_businesses(self.path, chunksize=2)], [3])
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,73 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'classes'))
+
+from transformers import resources
+from sentence import Sentence
+from business import Business
+
+class FingerprintTest(unittest.TestCase):
+
+	def setUp(self):
+		self.dir = tempfile.mkdtemp()
+		self.paths = dict(resources.PATHS)
+
+		self.model = os.path.join(self.dir, 'opin_pred.p')
+		self.lexicons = os.path.join(self.dir, 'Lexicons')
+		os.mkdir(self.lexicons)
+
+		self.write(self.model, 'model v1')
+		self.write(os.path.join(self.lexicons, 'positive-words.txt'), 'great\n')
+
+		resources.configure(opinion_model=self.model, liu_lexicons=self.lexicons)
+
+		self.pipeline_version = Sentence.__dict__['pipeline_version']
+		Sentence.pipeline_version = classmethod(lambda cls: 'pipeline v1') # needs no NLTK data
+
+	def tearDown(self):
+		Sentence.pipeline_version = self.pipeline_version
+		resources.PATHS.update(self.paths)
+		shutil.rmtree(self.dir)
+
+	def write(self, path, text, mtime=None):
+		with open(path, 'w') as f:
+			f.write(text)
+		if mtime is not None:
+			os.utime(path, (mtime, mtime))
+
+	def test_stable(self):
+		self.assertEqual(resources.fingerprint(['opinion_model', 'liu_lexicons']),
+						 resources.fingerprint(['liu_lexicons', 'opinion_model']))
+
+	def test_replaced_model(self):
+		before = resources.fingerprint(['opinion_model'])
+		self.write(self.model, 'model v2!', mtime=os.stat(self.model).st_mtime + 10)
+		self.assertNotEqual(resources.fingerprint(['opinion_model']), before)
+
+	def test_file_in_directory(self):
+		before = resources.fingerprint(['liu_lexicons'])
+		self.write(os.path.join(self.lexicons, 'negative-words.txt'), 'bad\n')
+		self.assertNotEqual(resources.fingerprint(['liu_lexicons']), before)
+
+	def test_reconfigured_and_missing(self):
+		before = resources.fingerprint(['opinion_model'])
+		resources.configure(opinion_model=os.path.join(self.dir, 'missing.p'))
+		self.assertNotEqual(resources.fingerprint(['opinion_model']), before)
+
+	def test_analysis_version(self):
+		before = Business.current_analysis_version()
+		self.assertEqual(Business.current_analysis_version(), before)
+
+		self.write(self.model, 'model v2!', mtime=os.stat(self.model).st_mtime + 10)
+		after_model = Business.current_analysis_version()
+		self.assertNotEqual(after_model, before)
+
+		Sentence.pipeline_version = classmethod(lambda cls: 'pipeline v2')
+		self.assertNotEqual(Business.current_analysis_version(), after_model)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,59 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'classes'))
+
+from score_cache import ScoreCache
+
+class StubSentence(object):
+	"""
+	Stand-in for Sentence, which only needs to encode itself here.
+	"""
+
+	def __init__(self, text):
+		self.text = text
+
+	def encode(self):
+		return {'text': self.text}
+
+class ScoreCacheTest(unittest.TestCase):
+
+	def setUp(self):
+		self.cache = ScoreCache()
+		self.sents = [StubSentence("sentence %d" % i) for i in range(3)]
+
+	def test_scoring_counts_misses(self):
+		for sent in self.sents:
+			self.cache.put(sent, 0.9, 0.2)
+
+		self.assertEqual((self.cache.hits, self.cache.misses), (0, 3))
+
+	def test_first_read_is_not_a_hit(self):
+		for sent in self.sents:
+			self.cache.put(sent, 0.9, 0.2)
+
+		for sent in self.sents: # e.g. the sentences of the first aspect
+			self.assertEqual(self.cache.get(sent)['text'], sent.text)
+
+		self.assertEqual((self.cache.hits, self.cache.misses), (0, 3))
+
+		self.cache.get(self.sents[0]) # the same sentence under another aspect
+		self.cache.get(self.sents[0])
+
+		self.assertEqual((self.cache.hits, self.cache.misses), (2, 3))
+		self.assertEqual(str(self.cache), "3 sentences cached, 2 hits, 3 misses")
+
+	def test_unscored_read_counts_nothing(self):
+		self.assertIsNone(self.cache.get(self.sents[0]))
+		self.assertEqual((self.cache.hits, self.cache.misses), (0, 0))
+
+	def test_restored_scores_are_not_misses(self):
+		self.cache.put(self.sents[0], 0.9, 0.2, scored=False)
+
+		self.assertIn(self.sents[0], self.cache)
+		self.assertAlmostEqual(self.cache.get(self.sents[0])['prob_neg'], 0.8)
+		self.assertEqual((self.cache.hits, self.cache.misses), (0, 0))
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,155 @@
+import os
+import sys
+import unittest
+import mongomock
+
+from pymongo.errors import AutoReconnect
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import storage
+from storage import BulkWriter, SummaryWriter, load_review_analyses
+
+class FakeClock(object):
+	"""
+	Stands in for the time module in storage: time only moves when
+	advanced, and sleeps are recorded rather than taken.
+	"""
+
+	def __init__(self):
+		self.now = 1000.0
+		self.sleeps = []
+
+	def time(self):
+		return self.now
+
+	def sleep(self, seconds):
+		self.sleeps.append(seconds)
+		self.now += seconds
+
+class FlakyCollection(object):
+	"""
+	Wraps a collection so that its first n_failures bulk writes raise AutoReconnect.
+	"""
+
+	def __init__(self, collection, n_failures):
+		self.collection = collection
+		self.n_failures = n_failures
+		self.n_attempts = 0
+
+	def bulk_write(self, requests, **kwargs):
+		self.n_attempts += 1
+		if self.n_attempts <= self.n_failures:
+			raise AutoReconnect("connection reset")
+		return self.collection.bulk_write(requests, **kwargs)
+
+	def __getattr__(self, name):
+		return getattr(self.collection, name)
+
+class StorageTest(unittest.TestCase):
+
+	def setUp(self):
+		self.db = mongomock.MongoClient().db
+		self.clock = FakeClock()
+		self.real_time = storage.time
+		storage.time = self.clock
+
+	def tearDown(self):
+		storage.time = self.real_time
+
+	def docs(self, n, start=0, text='Great food.'):
+		return [{'review_id': 'r%d' % i, 'business_id': 'b', 'text': text} for i in range(start, start + n)]
+
+	def test_flush_on_batch_size(self):
+		writer = BulkWriter(self.db.reviews, 'review_id', batch_size=3)
+
+		for doc in self.docs(2):
+			writer.add(doc)
+		self.assertEqual(self.db.reviews.count(), 0)
+
+		writer.add(self.docs(1, start=2)[0])
+		self.assertEqual(self.db.reviews.count(), 3)
+		self.assertEqual(writer.n_written, 3)
+
+	def test_flush_on_interval(self):
+		writer = BulkWriter(self.db.reviews, 'review_id', batch_size=100, flush_interval=60.0)
+
+		writer.add(self.docs(1)[0])
+		self.assertEqual(self.db.reviews.count(), 0)
+
+		self.clock.now += 61
+		writer.add(self.docs(1, start=1)[0])
+		self.assertEqual(self.db.reviews.count(), 2)
+
+	def test_close_flushes(self):
+		with BulkWriter(self.db.reviews, 'review_id', batch_size=100) as writer:
+			for doc in self.docs(5):
+				writer.add(doc)
+			self.assertEqual(self.db.reviews.count(), 0)
+
+		self.assertEqual(self.db.reviews.count(), 5)
+
+	def test_rerun_upserts(self):
+		for text in ('Great food.', 'Slow service.'):
+			with BulkWriter(self.db.reviews, 'review_id', batch_size=2) as writer:
+				for doc in self.docs(5, text=text):
+					writer.add(doc)
+
+		self.assertEqual(self.db.reviews.count(), 5)
+		self.assertEqual(set(doc['text'] for doc in self.db.reviews.find()), set(['Slow service.']))
+		self.assertEqual(len(load_review_analyses(self.db.reviews, 'b')), 5)
+
+	def test_retry_after_auto_reconnect(self):
+		collection = FlakyCollection(self.db.reviews, n_failures=2)
+
+		with BulkWriter(collection, 'review_id', batch_size=10, retry_delay=1.0) as writer:
+			for doc in self.docs(3):
+				writer.add(doc)
+
+		self.assertEqual(collection.n_attempts, 3)
+		self.assertEqual(self.clock.sleeps, [1.0, 2.0]) # exponential backoff
+		self.assertEqual(self.db.reviews.count(), 3)
+
+	def test_gives_up_after_max_retries(self):
+		collection = FlakyCollection(self.db.reviews, n_failures=10)
+		writer = BulkWriter(collection, 'review_id', max_retries=2)
+		writer.add(self.docs(1)[0])
+
+		self.assertRaises(AutoReconnect, writer.flush)
+		self.assertEqual(collection.n_attempts, 3)
+
+	def summary(self, n_overflow, name='Beckett\'s Table'):
+		overflow = [{'business_id': 'b', 'aspect': 'food', 'polarity': 'pos', 'confidence': 0.9 - i/100.0,
+					 'text': 'Great food %d.' % i, 'user': 'Bo'} for i in range(n_overflow)]
+		return {'business_id': 'b', 'business_name': name, 'aspects': ['food'], 'top_k': 10,
+				'aspect_summary': {'food': {'pos': [], 'neg': [], 'num_pos': 10 + n_overflow, 'num_neg': 0, 'frac_pos': 1.0}},
+				'overflow_sentences': overflow}
+
+	def test_summary_overflow_replaced(self):
+		with SummaryWriter(self.db.summaries, self.db.summary_sentences) as writer:
+			writer.add(self.summary(5))
+
+		self.clock.now += 10
+		with SummaryWriter(self.db.summaries, self.db.summary_sentences) as writer:
+			writer.add(self.summary(3, name='Renamed'))
+
+		self.assertEqual(self.db.summaries.count(), 1)
+		self.assertEqual(self.db.summary_sentences.count(), 3)
+
+		summary = self.db.summaries.find_one()
+		self.assertEqual(summary['business_name'], 'Renamed')
+		self.assertNotIn('overflow_sentences', summary)
+		self.assertIn('updated_at', summary)
+
+		index_keys = [info['key'] for info in self.db.summary_sentences.index_information().values()]
+		self.assertIn(SummaryWriter.OVERFLOW_INDEX, index_keys)
+
+	def test_summary_overflow_discarded_without_collection(self):
+		with SummaryWriter(self.db.summaries) as writer:
+			writer.add(self.summary(5))
+
+		self.assertEqual(self.db.summaries.count(), 1)
+		self.assertNotIn('overflow_sentences', self.db.summaries.find_one())
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,87 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+from sklearn.svm import SVC
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.datasets import make_classification
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'classes'))
+
+from transformers.svc import CompiledSVC
+
+def fit_model(kernel='rbf', labels=(0, 1), scaled=True, seed=117, **svc_params):
+	"""
+	INPUT: string (kernel), tuple (class labels), boolean (with a StandardScaler), int (random seed)
+	OUTPUT: fitted SVC or Pipeline, 2d np array (held-out rows to predict on)
+
+	Fits an SVC with probability=True (as the opinion model is) on synthetic
+	data shaped like the sentence features.
+	"""
+
+	X, y = make_classification(n_samples=700, n_features=16, n_informative=8, random_state=seed)
+	X[:, 0] *= 50 # features on different scales, as the real ones are
+	y = np.where(y == 1, labels[1], labels[0])
+
+	svc = SVC(kernel=kernel, probability=True, random_state=seed, **svc_params)
+	model = Pipeline([('scaler', StandardScaler()), ('clf', svc)]) if scaled else svc
+
+	return model.fit(X[:500], y[:500]), X[500:]
+
+class CompiledSVCTest(unittest.TestCase):
+
+	def assert_parity(self, model, X):
+		compiled = CompiledSVC.from_sklearn(model)
+
+		np.testing.assert_allclose(compiled.predict_proba(X), model.predict_proba(X), rtol=0, atol=1e-9)
+		np.testing.assert_array_equal(compiled.predict(X), model.predict(X))
+		np.testing.assert_array_equal(compiled.classes_, model.classes_)
+
+		return compiled
+
+	def test_rbf(self):
+		self.assert_parity(*fit_model('rbf', gamma=0.05, C=10))
+
+	def test_rbf_auto_gamma_unscaled(self):
+		self.assert_parity(*fit_model('rbf', scaled=False, gamma='auto'))
+
+	def test_linear(self):
+		self.assert_parity(*fit_model('linear', C=1))
+
+	def test_other_labels_and_class_weight(self):
+		self.assert_parity(*fit_model('rbf', labels=(-1, 1), gamma=0.1, class_weight='balanced'))
+
+	def test_chunking(self):
+		model, X = fit_model('rbf', gamma=0.05)
+		compiled = CompiledSVC.from_sklearn(model)
+
+		np.testing.assert_allclose(compiled.predict_proba(X, chunk_size=7), compiled.predict_proba(X), rtol=0, atol=1e-12)
+
+	def test_save_load(self):
+		model, X = fit_model('rbf', gamma=0.05)
+		compiled = CompiledSVC.from_sklearn(model)
+
+		tmp_dir = tempfile.mkdtemp()
+		try:
+			path = os.path.join(tmp_dir, 'opin_pred.npz')
+			compiled.save(path)
+			loaded = CompiledSVC.load(path)
+		finally:
+			shutil.rmtree(tmp_dir)
+
+		np.testing.assert_array_equal(loaded.predict_proba(X), compiled.predict_proba(X))
+		np.testing.assert_array_equal(loaded.classes_, compiled.classes_)
+
+	def test_unsupported(self):
+		X, y = make_classification(n_samples=200, n_features=6, n_informative=4, n_classes=3, random_state=0)
+
+		self.assertRaises(ValueError, CompiledSVC.from_sklearn, SVC(probability=True).fit(X, y)) # multiclass
+		self.assertRaises(ValueError, CompiledSVC.from_sklearn, SVC().fit(X, y == 0)) # no probabilities
+		self.assertRaises(ValueError, CompiledSVC.from_sklearn, SVC(kernel='poly', probability=True).fit(X, y == 0))
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,71 @@
+import os
+import sys
+import random
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'classes'))
+
+from transformers.tokenizers import MyPottsTokenizer
+
+# pieces of review text, weighted towards the cases where the fast path differs from the original
+FRAGMENTS = ['The', 'pizza', 'WAS', 'great', "didn't", 'self-serve', '3.50', '555-123-4567', '#tbt', '@joe',
+			 ':D', ':P', 'XD', ';-)', '>:(', '<3', ':-/', '=]', '...', '. . .', '!', '?', '<em>', '</em>',
+			 '&amp;', '&amp;', '&aacute;', '&lt;', '&nbsp;', '&eacute;', '&bogus;', '&', '#', ';', 'amp;', '&#',
+			 '&#233;', '&#8217;', '&#38;', '&#35;', '&#59;', '&#65;', '&#97;', '&#95;', '&#49;', '&#0;',
+			 '&#1114112;', '&#99999999999999999999;', 'eacute;', 'lt;', 'mp;', 't;', '&#108;',
+			 '\xc3\xa9', '\xe2\x80\x99', '\xff', '\x80']
+
+SEPARATORS = ['', ' ', ' ', ' ', '  ', '\n', '\t']
+
+def random_texts(n, seed=117):
+	"""
+	INPUT: int (number of texts), int (random seed)
+	OUTPUT: list of byte strings
+	"""
+
+	rand = random.Random(seed)
+	texts = []
+
+	for _ in range(n):
+		parts = []
+		for _ in range(rand.randint(1, 12)):
+			parts.append(rand.choice(FRAGMENTS))
+			parts.append(rand.choice(SEPARATORS))
+		texts.append("".join(parts))
+
+	return texts
+
+class MyPottsTokenizerTest(unittest.TestCase):
+
+	def setUp(self):
+		self.texts = random_texts(10000)
+
+	def assert_fast_matches_original(self, preserve_case):
+		original = MyPottsTokenizer(preserve_case=preserve_case, fast=False)
+		fast = MyPottsTokenizer(preserve_case=preserve_case)
+
+		for text in self.texts:
+			self.assertEqual(fast.tokenize(text), original.tokenize(text), repr(text))
+
+	def test_fast_matches_original(self):
+		self.assert_fast_matches_original(preserve_case=False)
+
+	def test_fast_matches_original_preserving_case(self):
+		self.assert_fast_matches_original(preserve_case=True)
+
+	def test_entities(self):
+		tokenizer = MyPottsTokenizer()
+
+		self.assertEqual(tokenizer.tokenize("fish &amp; chips"), ['fish', '&', 'amp', ';', 'chips'])
+		self.assertEqual(tokenizer.tokenize("fish &amp; chips &eacute;"), ['fish', 'and', 'chips', u'\xe9'])
+		self.assertEqual(tokenizer.tokenize("&#38;eacute; &&#108;t;"), [u'\xe9', '<'])
+
+	def test_tokenize_many(self):
+		tokenizer = MyPottsTokenizer()
+		self.assertEqual(tokenizer.tokenize_many(self.texts[:500]), [tokenizer.tokenize(text) for text in self.texts[:500]])
+
+	def test_rejects_non_str(self):
+		self.assertRaises(TypeError, MyPottsTokenizer().tokenize, None)
+
+if __name__ == '__main__':
+	unittest.main()